@@ -0,0 +1,400 @@
+# -*- coding: utf-8 -*-
+""" SignalCihangir sıcak yol ölçümleri ve sentetik yük üreticileri.
+Kullanım: python benchmark.py [ölçüm adı ...] [--json sonuc.json] [--compare onceki.json] [--processes N --signals M --backends local sqlite]
+Ad verilmezse hepsi çalışır. stress, N süreci aynı sinyal kaydına (--backends) yazdırıp tutarlılığı doğrular. --json sonuçları commit'ler arası karşılaştırma için makine okunur biçimde yazar;
+--compare önceki bir çıktıya göre hızlanma/yavaşlama oranlarını gösterir. Telegram API'si taklit edilir, ağa çıkılmaz. """
+import argparse
+import atexit
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+# main yapılandırmayı içe aktarılırken okur: ölçümler geçici dizinde, senkron gönderimle ve hız sınırı olmadan çalışır
+BENCH_DIR = tempfile.mkdtemp(prefix="signalcihangir-bench-"); atexit.register(shutil.rmtree, BENCH_DIR, True)
+os.environ.update(BOT_TOKEN="bench", CHAT_ID="1", TELEGRAM_ASYNC_DELIVERY="0", TELEGRAM_GLOBAL_RATE="0", TELEGRAM_CHAT_INTERVAL="0", TELEGRAM_GROUP_INTERVAL="0",
+                  STATE_BACKEND="local", SIGNAL_LOG_COMMIT_WINDOW_MS="0", SIGNAL_LOG_FSYNC="none", SIGNAL_DIGEST_WINDOW="0", SIGNAL_ARCHIVE_INTERVAL="0",
+                  SIGNAL_LOG_FILE_PATH=os.path.join(BENCH_DIR, "signals.json"), ANALIZ_FILE_PATH=os.path.join(BENCH_DIR, "analiz.json"),
+                  ANALIZ_SONUCLARI_FILE_PATH=os.path.join(BENCH_DIR, "analiz_sonuclari.json"))
+
+import main
+
+# --- Yardımcılar ---
+RESULTS = {}; _group = [""] # Ölçüm adı -> {"seconds": ..., ...}; --json ile yazılır
+
+def timed(fn, repeat=5, number=1):
+    """ fn'i `repeat` kez `number` tekrar çalıştırır; çağrı başına en iyi süreyi (sn) döndürür """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with quiet():
+            for _ in range(number): fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+def report(name, seconds, baseline=None, **extra):
+    line = f"  {name:<40} {seconds * 1000:10.3f} ms"
+    if baseline: line += f"   ({baseline / seconds:5.1f}x)"
+    if extra: line += "   " + " ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in extra.items())
+    print(line)
+    RESULTS[f"{_group[0]}/{name}"] = dict({"seconds": seconds}, **extra)
+
+@contextlib.contextmanager
+def quiet():
+    """ main'in konsol çıktısını ölçüm sırasında /dev/null'a yönlendirir """
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull): yield
+
+class TelegramStub:
+    """ telegram_client.post yerine geçer: ağa çıkmadan 200 döner, gönderilen parça sayısını ve baytlarını sayar """
+    class Response:
+        status_code = 200
+        def json(self): return {"ok": True}
+        def raise_for_status(self): pass
+
+    def __init__(self): self.calls = 0; self.bytes = 0; self.response = self.Response()
+    def post(self, method, payload):
+        self.calls += 1; self.bytes += len(str(payload.get("text", "")).encode("utf-8")); return self.response
+    def install(self): main.telegram_client.post = self.post; return self
+
+telegram_stub = TelegramStub().install()
+
+def write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f: json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def load_data_files(analiz=None, bist=None):
+    """ Sentetik verileri main'in okuduğu dosyalara yazar ve önbelleklerin hemen yeniden yüklemesini sağlar """
+    for data, path, cache in ((analiz, main.ANALIZ_FILE, main.analiz_cache), (bist, main.BIST_ANALIZ_FILE, main.bist_analiz_cache)):
+        if data is None: continue
+        write_json(path, data); cache.checked_at = 0.0
+        with quiet(): cache.get()
+
+# --- Emoji eşleme (format_bist_puanlama_output) ---
+def _legacy_emoji_lookup(yorumlar):
+    """ KeywordEmojiMatcher öncesindeki döngü: sözlük her çağrıda kurulur, her yorum tüm anahtarlarla karşılaştırılır """
+    emoji_map = dict(main.BIST_EMOJI_MAP); result = []
+    for y in yorumlar:
+        eklenecek_emoji = emoji_map["default"]; lower_y = y.lower(); found_emoji = False; best_match_key = ""
+        for k in emoji_map.keys():
+            if k != "default" and lower_y.startswith(k):
+                if len(k) > len(best_match_key): best_match_key = k
+        if best_match_key: eklenecek_emoji = emoji_map[best_match_key]; found_emoji = True
+        if not found_emoji:
+             for k, v in emoji_map.items():
+                 if k != "default" and k in lower_y: eklenecek_emoji = v; break
+        result.append(eklenecek_emoji)
+    return result
+
+def _matcher_emoji_lookup(yorumlar):
+    return [main.BIST_EMOJI_MATCHER.match(y.lower()) for y in yorumlar]
+
+def make_bist_comments(n_tickers, per_ticker=12, seed=42):
+    """ Önek eşleşen, içinde geçen ve hiç eşleşmeyen yorumlardan oluşan sentetik /bist_analiz yorumları """
+    rng = random.Random(seed); keys = [k for k in main.BIST_EMOJI_MAP if k != "default"]
+    fillers = ["son çeyrekte", "sektör ortalamasının", "üzerinde", "altında", "güçlü", "zayıf", "yatay seyrediyor"]
+    tickers = []
+    for _ in range(n_tickers):
+        comments = []
+        for _ in range(per_ticker):
+            kind = rng.random(); words = rng.sample(fillers, 3)
+            if kind < 0.5: comments.append(f"{rng.choice(keys).capitalize()} {' '.join(words)} (+{rng.randint(1, 10)})")
+            elif kind < 0.8: comments.append(f"{words[0].capitalize()} {rng.choice(keys)} {' '.join(words[1:])}")
+            else: comments.append(" ".join(words).capitalize())
+        tickers.append(comments)
+    return tickers
+
+def bench_emoji():
+    print("emoji: /bist_analiz yorum -> emoji eşleme")
+    for n in (50, 500):
+        tickers = make_bist_comments(n)
+        assert [_legacy_emoji_lookup(c) for c in tickers] == [_matcher_emoji_lookup(c) for c in tickers]
+        legacy = timed(lambda: [_legacy_emoji_lookup(c) for c in tickers])
+        report(f"eski döngü ({n} hisse x 12 yorum)", legacy)
+        report(f"KeywordEmojiMatcher ({n} hisse x 12 yorum)", timed(lambda: [_matcher_emoji_lookup(c) for c in tickers]), legacy)
+
+# --- Telegram mesaj bölme ---
+def _legacy_split(msg, max_length=4096):
+    """ iter_message_chunks öncesindeki bölücü: her paragrafta birikmiş mesajı yeniden kodlar, karakterle böler """
+    msg = str(msg); messages_to_send = []
+    if len(msg.encode('utf-8')) > max_length:
+        parts = msg.split('\n\n'); current_message = ""
+        for part in parts:
+            part_len = len(part.encode('utf-8')); current_len = len(current_message.encode('utf-8'))
+            if part_len >= max_length - 50:
+                if current_message: messages_to_send.append(current_message.strip())
+                current_message = ""; start = 0
+                while start < len(part):
+                    split_point = -1; search_end = min(start + max_length - 50, len(part))
+                    rfind_space = part.rfind(' ', start, search_end); rfind_newline = part.rfind('\n', start, search_end)
+                    split_point = max(rfind_space, rfind_newline)
+                    if split_point <= start or split_point < start + 50: split_point = search_end
+                    messages_to_send.append(part[start:split_point]); start = split_point
+                    if start < len(part) and part[start] in (' ', '\n'): start += 1
+            elif current_len + part_len + 2 <= max_length: current_message += part + "\n\n"
+            else: messages_to_send.append(current_message.strip()); current_message = part + "\n\n"
+        if current_message: messages_to_send.append(current_message.strip())
+    else: messages_to_send.append(msg)
+    return messages_to_send
+
+def make_analiz_data(n_symbols, seed=42):
+    """ analiz.json biçiminde sentetik veri: her sembol için puan, 9 metrik satırı ve hedef fiyat/sektör satırları """
+    rng = random.Random(seed); data = {}
+    metrics = [("📈", "P/E"), ("📉", "Forward P/E"), ("🧠", "PEG"), ("📊", "ROE"), ("💰", "Profit Margin"), ("💸", "Debt/Eq"), ("🚨", "Quick Ratio"), ("📈", "EPS this Y"), ("🔮", "EPS next Y")]
+    for i in range(n_symbols):
+        symbol = f"S{i:04d}"; puan = rng.randint(-30, 50)
+        detaylar = [f"{emoji} *{name} ({rng.uniform(-5, 150):.2f})* → {rng.choice(['Pahalı', 'Uygun', 'Güçlü', 'Zayıf', 'Yüksek borç'])} → {rng.choice(['+', '-'])}{rng.randint(1, 10)}" for emoji, name in metrics]
+        detaylar += [f"Hedef Fiyat: {rng.uniform(5, 900):.2f}", f"Potansiyel: %{rng.uniform(-20, 80):.1f}", f"Analist Sayısı: {rng.randint(1, 60)}", f"Sektör: {rng.choice(['Teknoloji', 'Sağlık', 'Enerji'])}", f"Endüstri: {rng.choice(['Yarı İletken', 'İlaç', 'Petrol & Gaz'])}"]
+        data[symbol] = {"puan": puan, "detaylar": detaylar, "yorum": f"{symbol} için analiz tamamlandı. Toplam puan: {puan}."}
+    return data
+
+def make_analiz_message(n_symbols):
+    """ /analiz ile n sembol istendiğinde gönderilecek birleşik mesaj """
+    data = make_analiz_data(n_symbols)
+    return "\n\n".join(main.format_analiz_output(dict(v, symbol=k)) for k, v in data.items())
+
+def bench_chunking():
+    print("chunking: Telegram mesaj bölme")
+    for n in (50, 500):
+        msg = make_analiz_message(n); size = len(msg.encode('utf-8'))
+        legacy = timed(lambda: _legacy_split(msg))
+        over = sum(1 for c in _legacy_split(msg) if len(c.encode('utf-8')) > 4096)
+        report(f"eski bölücü ({n} sembol, {size // 1024} KB, {over} taşan)", legacy)
+        report(f"iter_message_chunks ({n} sembol)", timed(lambda: list(main.iter_message_chunks(msg))), legacy)
+    msg = "🚀 Çok uzun tek paragraf şöyle böyle " * 4000 # Paragraf sınırı olmayan çok baytlı metin
+    legacy = timed(lambda: _legacy_split(msg)); over = sum(1 for c in _legacy_split(msg) if len(c.encode('utf-8')) > 4096)
+    report(f"eski bölücü (tek paragraf, {over} taşan)", legacy)
+    report("iter_message_chunks (tek paragraf)", timed(lambda: list(main.iter_message_chunks(msg))), legacy)
+
+def make_bist_data(n_tickers, seed=42):
+    """ analiz_sonuclari.json biçiminde sentetik BİST puanlama verisi """
+    rng = random.Random(seed); comments = make_bist_comments(n_tickers, seed=seed); data = {}
+    for i in range(n_tickers):
+        ticker = f"B{i:04d}"; score = round(rng.uniform(0, 100), 1)
+        data[ticker] = {"symbol": ticker, "tip": rng.choice(["Sanayi", "Banka", "Sigorta", "Holding"]), "score": score,
+                        "classification": "A" if score >= 75 else "B" if score >= 50 else "C", "comments": comments[i],
+                        "details": {k: rng.randint(-5, 10) for k in ("F/K", "PD/DD", "FAVÖK", "Net Borç", "Satışlar")},
+                        "analyst_summary": f"{ticker} için {rng.randint(1, 12)} analistten {rng.choice(['AL', 'TUT', 'SAT'])} önerisi."}
+    return data
+
+_SIGNAL_TEMPLATES = ("KAIRI {neg:.2f} seviyesinde", "Matisay {neg:.2f} değerinde", "Mükemmel Alış", "Alış Sayımı Tamamlandı",
+                     "Mükemmel Satış", "Satış Sayımı Tamamlandı", "RSI {pos:.1f} üzerine çıktı")
+_SIGNAL_EXCHANGES = ("BINANCE", "BIST_DLY", "BIST", "NASDAQ", "NYSE")
+
+def make_signal_log(m_lines, d_days, seed=42, end_day=None):
+    """ Son d gün (bugün dahil) üzerine eşit dağılmış m sinyal; /ozet'in tüm kategorilerini ve kategorisiz sinyalleri içerir """
+    rng = random.Random(seed); end_day = end_day or date.today(); signals = []
+    for i in range(m_lines):
+        day = end_day - timedelta(days=d_days - 1 - i * d_days // m_lines)
+        ts = datetime.combine(day, datetime.min.time()) + timedelta(seconds=rng.randint(0, 86399))
+        text = rng.choice(_SIGNAL_TEMPLATES).format(neg=rng.uniform(-45, 5), pos=rng.uniform(50, 90))
+        signals.append({"symbol": f"S{rng.randint(0, 999):04d}", "exchange": rng.choice(_SIGNAL_EXCHANGES), "signal": text, "server_timestamp": ts.isoformat()})
+    return signals
+
+def load_signal_log(signals):
+    """ Sinyal kaydını temizleyip verilen sinyalleri gün dosyalarına yazar; bellekteki özetler boşaltılır (soğuk başlangıç) """
+    store = main.signal_store; store.clear(include_archives=True); by_day = {}
+    for data in signals:
+        exchange = data.get("exchange", ""); line = (json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8")
+        by_day.setdefault(data["server_timestamp"][:10], []).append((line, main.summary_keys_for(exchange), main.classify_signal(data)))
+    with store.lock:
+        for day, lines in by_day.items(): store._write_lines(day, lines)
+        store._reset_caches(store.generation)
+
+# --- Mesaj biçimlendirme ---
+def bench_format():
+    print("format: /analiz ve /bist_analiz mesaj biçimlendirme")
+    analiz = [dict(v, symbol=k) for k, v in make_analiz_data(500).items()]; bist = list(make_bist_data(500).values())
+    report("format_analiz_output (500 sembol)", timed(lambda: [main.format_analiz_output(d) for d in analiz]))
+    report("format_bist_puanlama_output (500 hisse)", timed(lambda: [main.format_bist_puanlama_output(d) for d in bist]))
+
+# --- /ozet ---
+def bench_ozet():
+    print("ozet: günlük sinyal özeti")
+    store = main.signal_store; today = date.today().isoformat()
+    for m, d in ((10_000, 7), (100_000, 30)):
+        load_signal_log(make_signal_log(m, d)); per_day = store.count(today)
+        cold = timed(lambda: (store.summaries.clear(), store.summary(today)), repeat=3)
+        report(f"özet kurma, soğuk ({m} satır / {d} gün)", cold, lines_today=per_day)
+        report(f"özet, hazır ({m} satır / {d} gün)", timed(lambda: store.summary(today), number=100), cold)
+        report(f"handle_ozet_command ({m} satır / {d} gün)", timed(lambda: main.handle_ozet_command(1, ""), number=20))
+        report(f"handle_ozet_command BIST ({m} satır / {d} gün)", timed(lambda: main.handle_ozet_command(1, "BIST"), number=20))
+
+# --- Geçmiş günlerin arşivi ---
+def bench_archive():
+    print("archive: gzip arşivleme ve arşivden /ozet")
+    store = main.signal_store; day = (date.today() - timedelta(days=1)).isoformat(); m = 50_000
+    signals = make_signal_log(m, 2); load_signal_log(signals)
+    plain = timed(lambda: (store.summaries.clear(), store.summary(day)), repeat=3)
+    report(f"özet kurma, aktif dosya ({m // 2} satır)", plain)
+    start = time.perf_counter()
+    with quiet(): store.archive_old_days()
+    files, size = store.disk_usage()
+    report(f"compact_day ({m // 2} satır)", time.perf_counter() - start, archive_kb=os.path.getsize(store.archive_path(day)) // 1024, total_kb=size // 1024)
+    report(f"özet kurma, gzip arşiv ({m // 2} satır)", timed(lambda: (store.summaries.clear(), store.summary(day)), repeat=3), plain)
+    report(f"handle_ozet_command arşivden", timed(lambda: main.handle_ozet_command(1, f"BIST {day}"), number=20))
+
+# --- Sinyal kaydı yazımı ---
+def bench_append():
+    print("append: sinyal kaydı yazımı (fsync kapalı)")
+    signals = [{k: v for k, v in d.items() if k != "server_timestamp"} for d in make_signal_log(2000, 1)]
+    main.signal_store.clear(include_archives=True)
+    single = timed(lambda: [main.append_to_jsonl(main.SIGNAL_LOG_FILE, dict(d)) for d in signals], repeat=3)
+    report(f"append_to_jsonl x{len(signals)}", single, signals_per_s=len(signals) / single)
+    batched = timed(lambda: [main.append_signals_to_log([dict(d) for d in signals[i:i + 100]]) for i in range(0, len(signals), 100)], repeat=3)
+    report(f"append_signals_to_log x{len(signals)} (100'lük)", batched, single, signals_per_s=len(signals) / batched)
+    main.signal_store.clear(include_archives=True)
+
+# --- Telegram gönderimi ---
+def bench_delivery():
+    print("delivery: send_telegram_message (senkron, taklit API)")
+    for n in (50, 500):
+        msg = make_analiz_message(n); before = telegram_stub.calls
+        seconds = timed(lambda: main.send_telegram_message(1, msg), repeat=3)
+        report(f"send_telegram_message ({n} sembol)", seconds, chunks=(telegram_stub.calls - before) // 3)
+
+# --- Sütunlu sıralama/tarama ---
+def bench_columns():
+    print("columns: /top ve /screen")
+    data = make_analiz_data(5000); load_data_files(analiz=data)
+    report("AnalizColumns kurulumu (5000 sembol)", timed(lambda: main.AnalizColumns(data), repeat=3))
+    report("handle_top_command 20 (5000 sembol)", timed(lambda: main.handle_top_command(1, "20"), number=20))
+    report("handle_screen_command PE<20 ROE>15", timed(lambda: main.handle_screen_command(1, "PE<20 ROE>15"), number=20))
+
+# --- Uçtan uca (Flask test istemcisi) ---
+def _telegram_update(text): return json.dumps({"update_id": 1, "message": {"chat": {"id": 2000}, "text": text, "from": {"username": "bench", "first_name": "Bench"}}})
+
+def bench_e2e(n_requests=300):
+    print(f"e2e: Flask test istemcisiyle istekler ({n_requests} istek/senaryo, senkron gönderim)")
+    load_data_files(analiz=make_analiz_data(500), bist=make_bist_data(300)); load_signal_log(make_signal_log(10_000, 7))
+    client = main.app.test_client(); rng = random.Random(7)
+    scenarios = [("/telegram /analiz", lambda i: _telegram_update("/analiz " + ",".join(f"S{rng.randint(0, 499):04d}" for _ in range(5)))),
+                 ("/telegram /bist_analiz", lambda i: _telegram_update("/bist_analiz " + ",".join(f"B{rng.randint(0, 299):04d}" for _ in range(5)))),
+                 ("/telegram /ozet", lambda i: _telegram_update("/ozet")),
+                 ("/telegram /top", lambda i: _telegram_update("/top 20")),
+                 # Yazma senaryoları sonda: okuma senaryoları üretilen kayıt üzerinde ölçülsün
+                 ("/signal", lambda i: json.dumps({"symbol": f"S{i % 500:04d}", "exchange": "BINANCE", "signal": f"KAIRI -{20 + i % 20}.5 seviyesinde"})),
+                 ("/signals/batch", lambda i: json.dumps([{"symbol": f"S{j:04d}", "exchange": "BIST", "signal": "Mükemmel Alış"} for j in range(50)]))]
+    for name, make_body in scenarios:
+        path = name.split()[0]; bodies = [make_body(i) for i in range(n_requests)]; latencies = []
+        with quiet():
+            for body in bodies:
+                start = time.perf_counter(); r = client.post(path, data=body, content_type="application/json"); latencies.append(time.perf_counter() - start)
+                if r.status_code != 200: raise RuntimeError(f"{name}: HTTP {r.status_code} {r.data[:200]!r}")
+        latencies.sort(); total = sum(latencies)
+        report(name, total / n_requests, p50_ms=latencies[len(latencies) // 2] * 1000, p99_ms=latencies[int(len(latencies) * 0.99) - 1] * 1000, req_s=n_requests / total)
+
+# --- Çok süreçli ortak kayıt ---
+STRESS = argparse.Namespace(processes=4, signals=2000, backends=["local", "sqlite"]) # Komut satırından değiştirilebilir
+
+def open_store(backend, directory):
+    base = os.path.join(directory, "signals.json")
+    return main.SqliteSignalStore(os.path.join(directory, "signals.db"), base) if backend == "sqlite" else main.SignalStore(base)
+
+def _stress_worker(backend, directory, worker_id, n_signals, clearer, expected_total, barrier, results):
+    """ Alt süreç: kendi store nesnesiyle rastgele gruplar halinde yazar; her yazımdan sonra /ozet sayımını denetler,
+    herkes bitince diğer süreçlerin yazdıklarını da görmeli. clearer ise yazmak yerine aralıklarla kaydı temizler (başka süreçler yazarken /clear_signals). """
+    rng = random.Random(worker_id); store = open_store(backend, directory); today = date.today().isoformat(); violations = 0
+    store.summary(today); barrier.wait(); start = time.perf_counter()
+    if clearer:
+        for _ in range(n_signals // 200): time.sleep(0.01); store.clear(include_archives=True)
+    else:
+        written = seq = 0; last_seen = 0
+        while seq < n_signals:
+            batch = []
+            for _ in range(min(rng.randint(1, 20), n_signals - seq)):
+                text = rng.choice(_SIGNAL_TEMPLATES).format(neg=rng.uniform(-45, 5), pos=rng.uniform(50, 90))
+                batch.append({"symbol": f"S{rng.randint(0, 999):04d}", "exchange": rng.choice(_SIGNAL_EXCHANGES), "signal": text, "worker": worker_id, "seq": seq}); seq += 1
+            store.append_many(batch); written += len(batch)
+            count, _ = store.summary(today)
+            if count < written or count < last_seen: violations += 1 # Kendi yazdıkları görünmeli, sayım geri gitmemeli
+            last_seen = count
+    elapsed = time.perf_counter() - start; barrier.wait()
+    if expected_total is not None and store.summary(today)[0] != expected_total: violations += 1 # Diğer süreçlerin yazdıkları görünmüyor
+    store.close(); results.put((worker_id, elapsed, violations))
+
+def _run_stress(backend, directory, n_writers, n_signals, with_clearer):
+    ctx = multiprocessing.get_context("spawn"); n_procs = n_writers + with_clearer
+    barrier = ctx.Barrier(n_procs); results = ctx.Queue()
+    procs = [ctx.Process(target=_stress_worker, args=(backend, directory, i, n_signals, with_clearer and i == n_writers,
+                                                           None if with_clearer else n_writers * n_signals, barrier, results)) for i in range(n_procs)]
+    for proc in procs: proc.start()
+    outcomes = [results.get(timeout=600) for _ in procs]
+    for proc in procs: proc.join()
+    if any(proc.exitcode for proc in procs): raise RuntimeError(f"stress ({backend}): alt süreç hatayla çıktı")
+    return max(elapsed for _, elapsed, _ in outcomes), sum(v for _, _, v in outcomes)
+
+def verify_store(store, day, expect_all=None):
+    """ Kayıttaki sinyallerden özet yeniden kurulup store.summary/count ile karşılaştırılır; (sinyaller, hata listesi) döndürür """
+    signals = store.signals_for_day(day); errors = []; rebuilt = {}
+    for data in signals: main.SignalStore._add_to_summary(rebuilt, main.summary_keys_for(data.get("exchange", "")), main.classify_signal(data))
+    for key in ("*", "BIST", "BINANCE"):
+        expected = rebuilt.get(key, {"count": 0, "kategoriler": {}}); count, categories = store.summary(day, None if key == "*" else key)
+        if count != expected["count"]: errors.append(f"summary({key}) sayımı {count} != {expected['count']}")
+        if {k: sorted(v) for k, v in categories.items()} != {k: sorted(v) for k, v in expected["kategoriler"].items()}: errors.append(f"summary({key}) kategorileri farklı")
+        if store.count(day, None if key == "*" else key) != count: errors.append(f"count({key}) != summary({key})")
+        if key != "*" and len(store.signals_for_day(day, key)) != count: errors.append(f"signals_for_day({key}) {len(store.signals_for_day(day, key))} != {count}")
+    ids = [(d.get("worker"), d.get("seq")) for d in signals]
+    if store.count(day) != len(signals): errors.append(f"count {store.count(day)} != {len(signals)}")
+    if len(set(ids)) != len(ids): errors.append(f"{len(ids) - len(set(ids))} tekrar eden sinyal")
+    if expect_all is not None and set(ids) != expect_all: errors.append(f"{len(expect_all - set(ids))} sinyal kayıp")
+    return signals, errors
+
+def bench_stress():
+    n_writers, n_signals = STRESS.processes, STRESS.signals; today = date.today().isoformat()
+    print(f"stress: {n_writers} süreç x {n_signals} sinyal aynı kayda (her yazımdan sonra /ozet denetimi)")
+    for backend in STRESS.backends:
+        for with_clearer in (False, True):
+            directory = tempfile.mkdtemp(prefix=f"stress-{backend}-", dir=BENCH_DIR)
+            elapsed, violations = _run_stress(backend, directory, n_writers, n_signals, with_clearer)
+            store = open_store(backend, directory)
+            with quiet(): signals, errors = verify_store(store, today, None if with_clearer else {(w, s) for w in range(n_writers) for s in range(n_signals)})
+            store.close()
+            if with_clearer: violations = 0 # Temizleme sayımları düşürür; yalnızca son durumun tutarlılığı denetlenir
+            name = f"{backend}, {n_writers} yazıcı" + (" + clear" if with_clearer else "")
+            report(name, elapsed, signals_per_s=n_writers * n_signals / elapsed, stored=len(signals), violations=violations, errors=len(errors))
+            for error in errors: print(f"    ❌ {error}")
+
+BENCHMARKS = {"emoji": bench_emoji, "chunking": bench_chunking, "format": bench_format, "ozet": bench_ozet, "archive": bench_archive, "append": bench_append,
+              "delivery": bench_delivery, "columns": bench_columns, "e2e": bench_e2e, "stress": bench_stress}
+
+def _git_commit():
+    try: return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError): return None
+
+def write_results(path):
+    meta = {"commit": _git_commit(), "timestamp": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(), "platform": platform.platform()}
+    with open(path, "w", encoding="utf-8") as f: json.dump({"meta": meta, "results": RESULTS}, f, ensure_ascii=False, indent=2)
+    print(f"📄 Sonuçlar yazıldı: {path}")
+
+def compare_results(path):
+    """ Önceki çıktıdaki ortak ölçümlerle karşılaştırır (>1x: şimdi daha hızlı) """
+    with open(path, encoding="utf-8") as f: old = json.load(f)
+    print(f"compare: {path} (commit {old.get('meta', {}).get('commit')}) ile")
+    for name, result in RESULTS.items():
+        before = old.get("results", {}).get(name)
+        if before: print(f"  {name:<60} {before['seconds'] * 1000:10.3f} -> {result['seconds'] * 1000:10.3f} ms   ({before['seconds'] / result['seconds']:5.2f}x)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SignalCihangir sıcak yol ölçümleri")
+    parser.add_argument("names", nargs="*", help=f"çalıştırılacak ölçümler (varsayılan: hepsi): {', '.join(BENCHMARKS)}")
+    parser.add_argument("--json", metavar="DOSYA", help="sonuçları JSON olarak yaz")
+    parser.add_argument("--compare", metavar="DOSYA", help="önceki bir --json çıktısıyla karşılaştır")
+    parser.add_argument("--processes", type=int, default=STRESS.processes, help="stress: yazan süreç sayısı")
+    parser.add_argument("--signals", type=int, default=STRESS.signals, help="stress: süreç başına sinyal")
+    parser.add_argument("--backends", nargs="+", default=STRESS.backends, choices=["local", "sqlite"], help="stress: denenecek kayıt türleri")
+    args = parser.parse_args(); STRESS.processes, STRESS.signals, STRESS.backends = args.processes, args.signals, args.backends
+    names = args.names or list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown: sys.exit(f"Bilinmeyen ölçüm: {', '.join(unknown)} (mevcut: {', '.join(BENCHMARKS)})")
+    for name in names: _group[0] = name; BENCHMARKS[name]()
+    if args.json: write_results(args.json)
+    if args.compare: compare_results(args.compare)
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+""" waitress (Flask) ile ASGI (uvicorn) sunucu modlarını yerel sahte Telegram API'sine karşı yük altında karşılaştırır.
+Kullanım: python loadtest.py [--requests N] [--concurrency C] [--tg-latency-ms MS] [--modes waitress asgi] [--endpoints signal telegram]
+Her mod için main.py ayrı bir süreçte, geçici bir dizinde başlatılır; istek/sn ile p50/p99 gecikme raporlanır.
+Bildirimler (TG mesajları) kuyruk boşalana kadar beklenir; düşürülen/gönderilemeyen bildirimler /metrics'ten okunup hataya eklenir. """
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MAIN_PY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+FAKE_TOKEN = "123456:LOADTEST"; ADMIN_CHAT = "1000"
+
+# --- Sahte Telegram API ---
+class FakeTelegramAPI:
+    """ sendMessage çağrılarını sayan, isteğe bağlı gecikmeyle yanıt veren keep-alive HTTP sunucusu.
+    scripted'a eklenen (durum kodu, gövde) yanıtları sıradaki isteklere verilir (örn. 429 retry_after); clients bağlanan istemci adresleridir. """
+    def __init__(self, latency=0.0):
+        api = self; self.latency = latency; self.messages = 0; self.requests = 0; self.lock = threading.Lock()
+        self.scripted = []; self.clients = set()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"; disable_nagle_algorithm = True # Başlık ve gövde ayrı yazılır: Nagle + gecikmeli ACK her isteğe ~40 ms eklerdi
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if api.latency: time.sleep(api.latency)
+                with api.lock:
+                    api.requests += 1; api.clients.add(self.client_address); scripted = api.scripted.pop(0) if api.scripted else None
+                    if scripted is None: api.messages += 1; scripted = (200, {"ok": True, "result": {"message_id": api.messages}})
+                status, payload = scripted; body = json.dumps(payload).encode()
+                self.send_response(status); self.send_header("Content-Type", "application/json"); self.send_header("Content-Length", str(len(body))); self.end_headers()
+                self.wfile.write(body)
+            def log_message(self, *args): pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler); self.server.daemon_threads = True
+        self.server.handle_error = lambda request, client_address: None # Bot kapanırken kopan bağlantılar
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self): return f"http://127.0.0.1:{self.server.server_address[1]}"
+    def start(self): self.thread.start(); return self
+    def stop(self): self.server.shutdown(); self.server.server_close()
+
+# --- Sunucu süreci ---
+def _free_port():
+    with socket.socket() as s: s.bind(("127.0.0.1", 0)); return s.getsockname()[1]
+
+def start_bot(mode, api_base, workdir, port):
+    """ main.py'yi verilen modda başlatır ve / yanıt verene kadar bekler """
+    env = dict(os.environ, BOT_TOKEN=FAKE_TOKEN, CHAT_ID=ADMIN_CHAT, TELEGRAM_API_BASE=api_base, PORT=str(port), SERVER_MODE=mode,
+               SIGNAL_LOG_FILE_PATH=os.path.join(workdir, "signals.json"), ANALIZ_FILE_PATH=os.path.join(workdir, "analiz.json"),
+               ANALIZ_SONUCLARI_FILE_PATH=os.path.join(workdir, "analiz_sonuclari.json"),
+               TELEGRAM_GLOBAL_RATE="0", TELEGRAM_CHAT_INTERVAL="0", TELEGRAM_GROUP_INTERVAL="0", TELEGRAM_SHUTDOWN_TIMEOUT="5")
+    proc = subprocess.Popen([sys.executable, MAIN_PY], cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None: raise RuntimeError(f"{mode} sunucusu başlatılamadı:\n{proc.stderr.read().decode(errors='replace')}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1); conn.request("GET", "/"); conn.getresponse().read(); conn.close()
+            return proc
+        except OSError: time.sleep(0.1)
+    proc.kill(); raise RuntimeError(f"{mode} sunucusu 30 sn içinde yanıt vermedi")
+
+def stop_bot(proc):
+    proc.send_signal(signal.SIGTERM)
+    try: proc.wait(30)
+    except subprocess.TimeoutExpired: proc.kill(); proc.wait()
+
+# --- Yük üretimi ---
+def make_request(endpoint, i):
+    """ (yol, gövde) çifti: /signal için sinyal JSON'u, /telegram için /help komutu içeren güncelleme """
+    if endpoint == "signal":
+        return "/signal", json.dumps({"symbol": f"S{i % 500:04d}", "exchange": "BINANCE", "signal": f"KAIRI -{i % 30}.5 AL"}).encode()
+    return "/telegram", json.dumps({"update_id": i, "message": {"chat": {"id": 2000 + i % 50}, "text": "/help", "from": {"username": "yuk", "first_name": "Yük"}}}).encode()
+
+def drive(port, endpoint, n_requests, concurrency):
+    """ `concurrency` kalıcı bağlantıyla toplam n istek gönderir; (süre, gecikmeler, hata sayısı) döndürür """
+    latencies = []; errors = [0]; counter = iter(range(n_requests)); lock = threading.Lock()
+
+    def client():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30); local = []
+        while True:
+            with lock: i = next(counter, None)
+            if i is None: break
+            path, body = make_request(endpoint, i); start = time.perf_counter()
+            try:
+                conn.request("POST", path, body=body, headers={"Content-Type": "application/json"}); r = conn.getresponse(); r.read()
+                if r.status != 200: errors[0] += 1
+            except (OSError, http.client.HTTPException):
+                errors[0] += 1; conn.close(); conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            local.append(time.perf_counter() - start)
+        conn.close()
+        with lock: latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return time.perf_counter() - start, sorted(latencies), errors[0]
+
+def scrape_metrics(port):
+    """ /metrics çıktısını {seri adı (etiketlerle, önek olmadan): değer} sözlüğüne çevirir """
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10); conn.request("GET", "/metrics"); text = conn.getresponse().read().decode(); conn.close()
+    values = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"): continue
+        series, _, value = line.rpartition(" "); values[series.removeprefix("signalcihangir_")] = float(value)
+    return values
+
+def lost_notifications(port, timeout=60):
+    """ Gönderim kuyruğunun boşalmasını bekler; düşürülen + gönderilemeyen + hâlâ kuyrukta kalan bildirim sayısını döndürür """
+    deadline = time.monotonic() + timeout
+    while True:
+        values = scrape_metrics(port); depth = values.get("telegram_queue_depth", 0)
+        if not depth or time.monotonic() >= deadline: break
+        time.sleep(0.1)
+    return int(values.get("telegram_dropped_total", 0) + values.get('telegram_messages_total{result="failed"}', 0) + depth)
+
+def percentile(sorted_values, p):
+    if not sorted_values: return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))]
+
+def run(modes, endpoints, n_requests, concurrency, tg_latency):
+    print(f"loadtest: {n_requests} istek, {concurrency} eşzamanlı bağlantı, sahte TG gecikmesi {tg_latency * 1000:.0f} ms")
+    print(f"  {'mod':<10} {'endpoint':<10} {'istek/sn':>10} {'p50 ms':>9} {'p99 ms':>9} {'hata':>6} {'TG mesajı':>10} {'TG kayıp':>9}")
+    for endpoint in endpoints:
+        for mode in modes:
+            api = FakeTelegramAPI(tg_latency).start()
+            with tempfile.TemporaryDirectory() as workdir:
+                port = _free_port(); proc = start_bot(mode, api.base_url, workdir, port)
+                try:
+                    drive(port, endpoint, min(200, n_requests), concurrency) # Isınma
+                    lost_before = lost_notifications(port); messages_before = api.messages
+                    elapsed, latencies, errors = drive(port, endpoint, n_requests, concurrency)
+                    lost = lost_notifications(port) - lost_before # Gönderilemeyen bildirim de hatadır (istek 200 dönse bile)
+                    messages = api.messages - messages_before
+                finally: stop_bot(proc)
+            api.stop()
+            print(f"  {mode:<10} {endpoint:<10} {len(latencies) / elapsed:10.1f} {percentile(latencies, 50) * 1000:9.2f} {percentile(latencies, 99) * 1000:9.2f} {errors + lost:6d} {messages:10d} {lost:9d}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="waitress ve ASGI sunucu modlarını karşılaştırır")
+    parser.add_argument("--requests", type=int, default=2000, help="mod/endpoint başına istek sayısı")
+    parser.add_argument("--concurrency", type=int, default=32, help="eşzamanlı istemci bağlantısı")
+    parser.add_argument("--tg-latency-ms", type=float, default=50.0, help="sahte Telegram API yanıt gecikmesi")
+    parser.add_argument("--modes", nargs="+", default=["waitress", "asgi"], choices=["waitress", "asgi"])
+    parser.add_argument("--endpoints", nargs="+", default=["signal", "telegram"], choices=["signal", "telegram"])
+    args = parser.parse_args()
+    run(args.modes, args.endpoints, args.requests, args.concurrency, args.tg_latency_ms / 1000)
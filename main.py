@@ -1,13 +1,30 @@
 # -*- coding: utf-8 -*-
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import json
 import requests
 import os
 import time
 import re
-from datetime import datetime, date
+import heapq
+import itertools
+import asyncio
+import random
+import threading
+import atexit
+import contextlib
+import glob
+import gzip
+import sys
+from collections import OrderedDict, deque
+from datetime import datetime, date, timedelta
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 import traceback
+import numpy as np
+try: import fcntl # Süreçler arası dosya kilidi (POSIX)
+except ImportError: fcntl = None
+try: import sqlite3 # STATE_BACKEND=sqlite
+except ImportError: sqlite3 = None
 # import locale # Gerek kalmadı
 
 # Ortam değişkenlerini yükle
@@ -19,28 +36,156 @@ ANALIZ_FILE = os.getenv("ANALIZ_FILE_PATH", "analiz.json")
 BIST_ANALIZ_FILE = os.getenv("ANALIZ_SONUCLARI_FILE_PATH", "analiz_sonuclari.json")
 SIGNAL_LOG_FILE = os.getenv("SIGNAL_LOG_FILE_PATH", "signals.json")
 
+# Telegram gönderim kuyruğu ayarları
+TELEGRAM_ASYNC_DELIVERY = os.getenv("TELEGRAM_ASYNC_DELIVERY", "1") != "0" # 0 ise mesajlar istek içinde (senkron) gönderilir
+TELEGRAM_WORKERS = max(1, int(os.getenv("TELEGRAM_WORKERS", "4")))
+TELEGRAM_QUEUE_SIZE = max(TELEGRAM_WORKERS, int(os.getenv("TELEGRAM_QUEUE_SIZE", "1000")))
+TELEGRAM_CHAT_QUEUE_SIZE = max(1, int(os.getenv("TELEGRAM_CHAT_QUEUE_SIZE", str(TELEGRAM_QUEUE_SIZE // 2)))) # Tek sohbette bekleyebilecek en fazla mesaj (uyarı seli kuyruğun tamamını doldurmasın)
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30")) # Tüm sohbetler için saniyede en fazla mesaj
+TELEGRAM_CHAT_INTERVAL = float(os.getenv("TELEGRAM_CHAT_INTERVAL", "1.0")) # Özel sohbette mesajlar arası saniye
+TELEGRAM_GROUP_INTERVAL = float(os.getenv("TELEGRAM_GROUP_INTERVAL", "3.0")) # Gruplarda (dakikada 20 mesaj) mesajlar arası saniye
+TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", "5"))
+TELEGRAM_SHUTDOWN_TIMEOUT = float(os.getenv("TELEGRAM_SHUTDOWN_TIMEOUT", "10"))
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org").rstrip("/") # Test/yük ölçümü için sahte sunucuya yönlendirilebilir
+TELEGRAM_CONNECT_TIMEOUT = float(os.getenv("TELEGRAM_CONNECT_TIMEOUT", "5"))
+TELEGRAM_READ_TIMEOUT = float(os.getenv("TELEGRAM_READ_TIMEOUT", "20"))
+SIGNAL_LOG_COMMIT_WINDOW_MS = float(os.getenv("SIGNAL_LOG_COMMIT_WINDOW_MS", "2")) # Bu süre içinde gelen sinyaller tek yazımda birleştirilir
+SIGNAL_LOG_FSYNC = os.getenv("SIGNAL_LOG_FSYNC", "none").lower() # none | batch (her yazım grubu) | interval
+SIGNAL_LOG_FSYNC_INTERVAL = float(os.getenv("SIGNAL_LOG_FSYNC_INTERVAL", "1.0")) # SIGNAL_LOG_FSYNC=interval için sn
+SIGNAL_ARCHIVE_INTERVAL = float(os.getenv("SIGNAL_ARCHIVE_INTERVAL", "3600")) # Geçmiş gün dosyalarının gzip arşivine taşınma kontrol aralığı (sn); 0 = arşivleme kapalı
+SIGNAL_ARCHIVE_DEDUP_WINDOW = float(os.getenv("SIGNAL_ARCHIVE_DEDUP_WINDOW", "300")) # Arşivlerken bu kadar sn içinde tekrarlanan aynı sinyal (sembol+borsa+metin) atılır; 0 = atma
+SIGNAL_ARCHIVE_RETENTION_DAYS = int(os.getenv("SIGNAL_ARCHIVE_RETENTION_DAYS", "0")) # >0 ise bundan eski arşivler silinir
+STATE_BACKEND = os.getenv("STATE_BACKEND", "local").lower() # Sinyal kaydı: local (gün dosyaları, flock ile süreçler arası güvenli) | sqlite (WAL; çok süreçli kurulum)
+SIGNAL_DB_PATH = os.getenv("SIGNAL_DB_PATH") # STATE_BACKEND=sqlite için veritabanı; varsayılan sinyal kaydının yanında signals.db
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "30")) # Başka süreç yazarken en fazla bu kadar sn beklenir
+SIGNAL_DIGEST_WINDOW = float(os.getenv("SIGNAL_DIGEST_WINDOW", "0")) # >0 ise yönetici bildirimleri bu kadar sn biriktirilip tek özet olarak gönderilir
+SIGNAL_DIGEST_MAX = int(os.getenv("SIGNAL_DIGEST_MAX", "50")) # Bu kadar sinyal birikince pencere beklenmeden gönderilir
+SIGNAL_DIGEST_DEDUP = os.getenv("SIGNAL_DIGEST_DEDUP", "0") == "1" # Pencere içinde aynı sembol+sinyal bir kez bildirilir
+SIGNAL_BATCH_MAX = int(os.getenv("SIGNAL_BATCH_MAX", "500")) # /signals/batch isteğinde kabul edilen en fazla sinyal
+JSON_CACHE_CHECK_INTERVAL = float(os.getenv("JSON_CACHE_CHECK_INTERVAL", "1.0")) # Analiz dosyalarının değişiklik kontrol aralığı (sn)
+SCREEN_RESULT_LIMIT = int(os.getenv("SCREEN_RESULT_LIMIT", "50")) # /top, /screen, /bist_top en fazla bu kadar satır gösterir
+SERVER_MODE = os.getenv("SERVER_MODE", "waitress").lower() # "asgi" ise uvicorn ile async çalışır (--asgi ile de seçilir)
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1")) # ASGI modunda süreç sayısı; >1 ise sinyal kaydı süreçler arasında paylaşılır
+PORT = int(os.getenv("PORT", "5000"))
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN") # Ayarlıysa POST /debug/profiler ile örnekleyici profiler açılıp kapatılabilir
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL", "0.01")) # Profiler örnekleme aralığı (sn)
+WAITRESS_THREADS = int(os.getenv("WAITRESS_THREADS", "4")) # waitress istek thread sayısı
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "512")) # /analiz ve /bist_analiz için önbelleğe alınan hazır mesaj sayısı (0 = kapalı)
+
 app = Flask(__name__)
 
 # --- Yardımcı Fonksiyonlar --- (Değişiklik Yok)
-def load_json_file(path):
-    try:
-        if not os.path.exists(path): print(f"❌ Uyarı: JSON dosyası bulunamadı: {path}"); return {}
-        if os.path.getsize(path) == 0: print(f"❌ Uyarı: JSON dosyası boş: {path}"); return {}
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            if not isinstance(data, dict): raise ValueError("JSON root is not a dictionary")
-            return data
-    except (json.JSONDecodeError, ValueError) as e:
-        error_message = f"🚨 JSON Okuma/Format Hatası!\nDosya: {os.path.basename(path)}\nHata: {e}"; print(f"❌ {error_message}")
-        if ADMIN_CHAT_ID: send_telegram_message(ADMIN_CHAT_ID, error_message, parse_mode=None, avoid_self_notify=True)
-        return None
-    except Exception as e:
-        error_message = f"🚨 Genel JSON Yükleme Hatası!\nDosya: {os.path.basename(path)}\nHata: {e}\n{traceback.format_exc()}"; print(f"❌ {error_message}")
-        if ADMIN_CHAT_ID: send_telegram_message(ADMIN_CHAT_ID, error_message, parse_mode=None, avoid_self_notify=True)
-        return None
+def _read_json_dict(path):
+    """ JSON dosyasını okur; kök sözlük değilse ValueError fırlatır """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+        if not isinstance(data, dict): raise ValueError("JSON root is not a dictionary")
+        return data
+
+def _report_json_error(path, e, details=False):
+    if details: error_message = f"🚨 Genel JSON Yükleme Hatası!\nDosya: {os.path.basename(path)}\nHata: {e}\n{traceback.format_exc()}"
+    else: error_message = f"🚨 JSON Okuma/Format Hatası!\nDosya: {os.path.basename(path)}\nHata: {e}"
+    print(f"❌ {error_message}")
+    if ADMIN_CHAT_ID: send_telegram_message(ADMIN_CHAT_ID, error_message, parse_mode=None, avoid_self_notify=True)
+
+class JsonFileCache:
+    """ JSON dosyasını bellekte tutar; stat (mtime/boyut/inode) değişince yeniden yükler.
+    Yarım kalmış/bozuk yazımda son sağlam veri kullanılmaya devam eder ve yönetici her dosya sürümü için bir kez uyarılır. """
+    def __init__(self, path, check_interval=JSON_CACHE_CHECK_INTERVAL):
+        self.path = path; self.check_interval = check_interval
+        self.snapshot = (None, 0) # (veri, sürüm) birlikte değişir; okuyucular tutarlı bir çift görür
+        self.signature = None; self.failed_signature = None
+        self.checked_at = 0.0; self.lock = threading.Lock()
+        self.listeners = [] # Yeni sürüm yüklendiğinde çağrılır: listener(veri, sürüm)
+        self.view_builders = {}; self.views = {} # Veriden türetilen görünümler: ad -> (sürüm, görünüm)
+
+    @property
+    def data(self): return self.snapshot[0]
+
+    @property
+    def version(self): return self.snapshot[1]
+
+    def get(self):
+        """ Güncel veriyi döndürür: dosya yoksa/boşsa {} , hiç sağlam sürüm okunamadıysa None """
+        return self.get_snapshot()[0]
+
+    def add_view(self, name, build):
+        """ Her yeni sürüm yüklendiğinde build(veri) ile bir kez kurulan türetilmiş görünüm ekler """
+        self.view_builders[name] = build
+
+    def get_view(self, name):
+        """ Güncel veri sürümüne ait görünümü döndürür (gerekirse kurar) """
+        data, version = self.get_snapshot(); view = self.views.get(name)
+        if view is None or view[0] != version:
+            view = (version, self.view_builders[name](data or {})); self.views[name] = view
+        return view[1]
+
+    def get_snapshot(self):
+        """ (veri, sürüm) döndürür; sürüm, veriden türetilen önbelleklerin anahtarı olarak kullanılır """
+        snapshot = self.snapshot
+        if snapshot[0] is not None and time.monotonic() - self.checked_at < self.check_interval: return snapshot
+        with self.lock:
+            now = time.monotonic(); snapshot = self.snapshot; data, version = snapshot
+            if data is not None and now - self.checked_at < self.check_interval: return snapshot
+            self.checked_at = now
+            try: st = os.stat(self.path)
+            except FileNotFoundError:
+                if data is None: print(f"❌ Uyarı: JSON dosyası bulunamadı: {self.path}"); return {}, version
+                return snapshot # Dosya yeniden yazılırken kısa süre yok olabilir
+            signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+            if signature == self.signature or signature == self.failed_signature: return snapshot
+            if st.st_size == 0:
+                self.failed_signature = signature
+                if data is None: print(f"❌ Uyarı: JSON dosyası boş: {self.path}"); return {}, version
+                print(f"⚠️ JSON dosyası boş (yazım sürüyor olabilir), önceki veri kullanılıyor: {self.path}"); return snapshot
+            file_label = os.path.basename(self.path)
+            try:
+                with metrics.timer("json_load_duration_seconds", file=file_label): new_data = _read_json_dict(self.path)
+            except (json.JSONDecodeError, ValueError) as e:
+                self.failed_signature = signature; metrics.inc("json_load_errors_total", file=file_label); _report_json_error(self.path, e); return snapshot
+            except Exception as e:
+                self.failed_signature = signature; metrics.inc("json_load_errors_total", file=file_label); _report_json_error(self.path, e, details=True); return snapshot
+            self.snapshot = snapshot = (new_data, version + 1); self.signature = signature; self.failed_signature = None
+            print(f"🔄 JSON önbelleği yüklendi: {os.path.basename(self.path)} ({len(new_data)} kayıt, sürüm {version + 1})")
+            for name, build in self.view_builders.items():
+                try: self.views[name] = (version + 1, build(new_data))
+                except Exception as e: print(f"⚠️ Görünüm kurulamadı ({os.path.basename(self.path)} / {name}): {e}")
+            for listener in self.listeners:
+                try: listener(*snapshot)
+                except Exception as e: print(f"⚠️ JSON önbellek dinleyici hatası ({os.path.basename(self.path)}): {e}")
+            return snapshot
+
+class RenderCache:
+    """ Sembol başına hazırlanmış mesaj metinleri (LRU). Anahtar (sembol, veri sürümü); kaynak dosya yeniden yüklenince tümü silinir. """
+    def __init__(self, max_size):
+        self.max_size = max_size; self.items = OrderedDict(); self.lock = threading.Lock()
+
+    def get_or_render(self, symbol, version, render):
+        key = (symbol, version)
+        with self.lock:
+            text = self.items.get(key)
+            if text is not None: self.items.move_to_end(key); return text
+        text = render()
+        if self.max_size > 0:
+            with self.lock:
+                self.items[key] = text; self.items.move_to_end(key)
+                while len(self.items) > self.max_size: self.items.popitem(last=False)
+        return text
+
+    def clear(self, *_):
+        with self.lock: self.items.clear()
+
+analiz_cache = JsonFileCache(ANALIZ_FILE)
+bist_analiz_cache = JsonFileCache(BIST_ANALIZ_FILE)
+analiz_render_cache = RenderCache(RENDER_CACHE_SIZE); analiz_cache.listeners.append(analiz_render_cache.clear)
+bist_render_cache = RenderCache(RENDER_CACHE_SIZE); bist_analiz_cache.listeners.append(bist_render_cache.clear)
+analiz_cache.add_view("columns", lambda data: AnalizColumns(data)) # Sınıflar aşağıda tanımlı; kurulum ilk yüklemede yapılır
+bist_analiz_cache.add_view("columns", lambda data: BistColumns(data))
 
 def append_to_jsonl(path, data_dict):
     try:
+        if path == SIGNAL_LOG_FILE: # Sinyal kaydı gün bazlı bölümlere yazılır
+            signal_store.append_many([data_dict]); metrics.inc("signals_ingested_total", source="signal"); return True
         data_dict['server_timestamp'] = datetime.now().isoformat()
         json_string = json.dumps(data_dict, ensure_ascii=False)
         with open(path, "a", encoding="utf-8") as f: f.write(json_string + "\n")
@@ -52,42 +197,588 @@ def append_to_jsonl(path, data_dict):
              send_telegram_message(ADMIN_CHAT_ID, error_message[:4000], parse_mode=None, avoid_self_notify=True)
         return False
 
+def append_signals_to_log(signals):
+    """ Birden çok sinyali tek yazım grubunda kaydeder (/signals/batch) """
+    try:
+        signal_store.append_many(signals); metrics.inc("signals_ingested_total", len(signals), source="batch")
+        return True
+    except Exception as e:
+        print(f"❌ JSONL dosyasına yazma hatası ({SIGNAL_LOG_FILE}): {e}")
+        if ADMIN_CHAT_ID:
+             error_message = f"🚨 Dosyaya Yazma Hatası!\nDosya: {os.path.basename(SIGNAL_LOG_FILE)}\nHata: {e}\nSinyal sayısı: {len(signals)}"
+             send_telegram_message(ADMIN_CHAT_ID, error_message[:4000], parse_mode=None, avoid_self_notify=True)
+        return False
+
+_MARKDOWN_CHARS = ("*", "_", "`", "[", "\\")
+
+def _scan_markdown(text, state):
+    """ Metindeki Markdown işaretlerine göre açık varlık durumunu günceller: state = [kalın, italik, kod, pre, bağlantı] """
+    i = 0; n = len(text)
+    while i < n:
+        ch = text[i]
+        if state[3]: # ``` bloğu
+            if text.startswith("```", i): state[3] = False; i += 3; continue
+        elif state[2]: # `kod`
+            if ch == '`': state[2] = False
+        elif ch == '\\': i += 2; continue # Kaçışlı karakter
+        elif text.startswith("```", i): state[3] = True; i += 3; continue
+        elif ch == '`': state[2] = True
+        elif state[4] == 2: # [metin]( ... ) bağlantı adresi
+            if ch == ')': state[4] = 0
+        elif ch == '[' and not state[4]: state[4] = 1
+        elif ch == ']' and state[4] == 1: state[4] = 2 if text.startswith("(", i + 1) else 0
+        elif ch == '*' and not state[1]: state[0] = not state[0]
+        elif ch == '_' and not state[0]: state[1] = not state[1]
+        i += 1
+
+def _update_markdown_state(text, state):
+    """ _scan_markdown'ın hızlı yolu: metinde tek tür işaret (* ya da _) varsa durum sayının tek/çift olmasından bulunur """
+    present = [c for c in _MARKDOWN_CHARS if c in text]
+    if not present: return
+    if len(present) == 1 and not any(state[1:]) and present[0] == "*": state[0] ^= text.count("*") % 2 == 1; return
+    if len(present) == 1 and not state[0] and not any(state[2:]) and present[0] == "_": state[1] ^= text.count("_") % 2 == 1; return
+    _scan_markdown(text, state)
+
+def _utf8_len(text): return len(text) if text.isascii() else len(text.encode('utf-8'))
+
+def _split_units(text, sep, markdown):
+    """ Metni sep ile böler; açık bir Markdown varlığının içinde kalan ayraçlarda bölmez. (parça, bayt, varlıklar kapalı mı) üretir. """
+    state = [False, False, False, False, 0]; pending = []
+    for part in text.split(sep):
+        pending.append(part)
+        if markdown: _update_markdown_state(part, state)
+        if not markdown or not any(state):
+            unit = pending[0] if len(pending) == 1 else sep.join(pending); pending = []
+            yield unit, _utf8_len(unit), True
+    if pending: # Kapanmayan varlık: kalan metin tek parça
+        unit = sep.join(pending); yield unit, _utf8_len(unit), False
+
+def _window_split(text, max_bytes, markdown):
+    """ Sığmayan paragrafı böler: max_bytes'lık pencerede son satır sonunu, yoksa son boşluğu arar (açık Markdown varlığı içinde kalmayan);
+    hiçbiri yoksa UTF-8 karakter sınırından keser. Metin bir kez kodlanır, pencere başına sabit sayıda arama yapılır. """
+    data = text.encode('utf-8'); start = 0
+    while len(data) - start > max_bytes:
+        window = data[start:start + max_bytes].decode('utf-8', errors='ignore'); cut = None; fallback = None
+        if not window: window = data[start:start + 4].decode('utf-8', errors='ignore')[:1] # max_bytes tek karakterden küçük
+        for sep in ("\n", " "):
+            k = window.rfind(sep); tries = 0
+            while k > 0 and tries < 8:
+                candidate = window[:k]; state = [False, False, False, False, 0]
+                if markdown: _update_markdown_state(candidate, state)
+                if not any(state): cut = (candidate, len(sep)); break
+                if fallback is None: fallback = (candidate, len(sep))
+                k = window.rfind(sep, 0, k); tries += 1
+            if cut: break
+        cut = cut or fallback or (window, 0)
+        yield cut[0]; start += len(cut[0].encode('utf-8')) + cut[1]
+    if start < len(data): yield data[start:].decode('utf-8')
+
+def _pack_chunks(text, max_bytes, markdown):
+    """ Paragrafları (\\n\\n) max_bytes'ı aşmayacak şekilde birleştirir; tek başına sığmayan paragraf _window_split ile bölünür """
+    sep = "\n\n"; buf = []; size = 0
+    for unit, n, closed in _split_units(text, sep, markdown):
+        if n > max_bytes:
+            if buf: yield sep.join(buf); buf = []; size = 0
+            yield from _window_split(unit, max_bytes, markdown and closed)
+        elif buf and size + len(sep) + n > max_bytes: yield sep.join(buf); buf = [unit]; size = n
+        elif buf: buf.append(unit); size += len(sep) + n
+        else: buf = [unit]; size = n
+    if buf: yield sep.join(buf)
+
+def iter_message_chunks(msg, max_bytes=4096, markdown=True):
+    """ Mesajı en fazla max_bytes (UTF-8) baytlık parçalar halinde (generator) üretir.
+    Parçalar paragraf, satır, boşluk sırasıyla tercih edilen sınırlardan oluşturulur; markdown=True ise açık *, _, `, ``` ya da [..](..) içinden bölünmez.
+    Metin paragraf düzeyinde bir kez taranır; bayt uzunlukları parça başına bir kez hesaplanır. """
+    msg = str(msg)
+    if len(msg) * 4 <= max_bytes or len(msg.encode('utf-8')) <= max_bytes: yield msg; return
+    for chunk in _pack_chunks(msg, max_bytes, markdown):
+        chunk = chunk.strip()
+        if chunk: yield chunk
+
+class _RateLimiter:
+    """ Token-bucket hız sınırlayıcı (thread-safe). Telegram'ın global sınırı için kullanılır. """
+    def __init__(self, rate, burst=None):
+        self.rate = rate; self.capacity = burst or max(rate, 1.0); self.tokens = self.capacity
+        self.updated = time.monotonic(); self.lock = threading.Lock()
+
+    def reserve(self):
+        """ Bir gönderim hakkı ayırır; hak kullanılmadan önce beklenmesi gereken süreyi (sn) döndürür """
+        if self.rate <= 0: return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate) - 1; self.updated = now
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay > 0: time.sleep(delay)
+
+class _ChatPacer:
+    """ Sohbet başına gönderim aralığını korur: her çağrı bir sonraki boş zaman dilimini rezerve eder. """
+    def __init__(self, private_interval, group_interval):
+        self.private_interval = private_interval; self.group_interval = group_interval
+        self.next_slot = {}; self.lock = threading.Lock()
+
+    def reserve(self, chat_id):
+        """ Sohbet için bir sonraki zaman dilimini ayırır; o ana kadar beklenecek süreyi (sn) döndürür """
+        # Grup/kanal ID'leri negatiftir; Telegram bunlara daha sıkı sınır uygular
+        chat_id = str(chat_id); interval = self.group_interval if chat_id.startswith('-') else self.private_interval
+        with self.lock:
+            now = time.monotonic(); slot = max(now, self.next_slot.get(chat_id, 0.0))
+            self.next_slot[chat_id] = slot + interval
+        return slot - now
+
+    def wait(self, chat_id):
+        delay = self.reserve(chat_id)
+        if delay > 0: time.sleep(delay)
+
+_global_rate_limiter = _RateLimiter(TELEGRAM_GLOBAL_RATE)
+_chat_pacer = _ChatPacer(TELEGRAM_CHAT_INTERVAL, TELEGRAM_GROUP_INTERVAL)
+
+def _retry_delay(attempt):
+    """ Üstel geri çekilme (jitter'lı): 0.5, 1, 2, 4 ... en fazla 30 sn """
+    return min(30.0, 0.5 * (2 ** attempt)) * (0.8 + random.random() * 0.4)
+
+class LatencyHistogram:
+    """ Sabit kovalı süre histogramı (sn). Kovalar kümülatif değildir; snapshot kümülatif sayıları verir. """
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets); self.counts = [0] * (len(self.buckets) + 1); self.total = 0.0; self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = 0
+        while i < len(self.buckets) and seconds > self.buckets[i]: i += 1
+        with self.lock: self.counts[i] += 1; self.total += seconds
+
+    def snapshot(self):
+        """ {"buckets": [(üst sınır, kümülatif sayı), ...], "count": n, "sum": toplam sn} """
+        with self.lock: counts = list(self.counts); total = self.total
+        cumulative = []; running = 0
+        for bound, c in zip(self.buckets + (float("inf"),), counts): running += c; cumulative.append((bound, running))
+        return {"buckets": cumulative, "count": running, "sum": total}
+
+class MetricsRegistry:
+    """ Süreç içi sayaçlar ve süre histogramları; /metrics için Prometheus metin biçiminde dışa aktarılır.
+    Ölçüm anında hesaplanan değerler (kuyruk derinliği, kayıt boyutu vb.) collector fonksiyonlarıyla eklenir. """
+    def __init__(self, prefix="signalcihangir_"):
+        self.prefix = prefix; self.lock = threading.Lock()
+        self.counters = {}; self.histograms = {}; self.help = {} # ad -> {etiketler: değer/LatencyHistogram}, ad -> açıklama
+        self.collectors = [] # collector() -> [(ad, tür, açıklama, [(etiketler, değer veya histogram snapshot'ı), ...]), ...]
+
+    @staticmethod
+    def _key(labels): return tuple(sorted(labels.items()))
+
+    def describe(self, name, help_text): self.help[name] = help_text
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            series = self.counters.setdefault(name, {}); series[key] = series.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(labels); series = self.histograms.get(name, {}); histogram = series.get(key)
+        if histogram is None:
+            with self.lock: histogram = self.histograms.setdefault(name, {}).setdefault(key, LatencyHistogram())
+        histogram.observe(seconds)
+
+    def timer(self, name, **labels):
+        """ with metrics.timer("ad", etiket=...): bloğun süresini histograma ekler """
+        return _MetricTimer(self, name, labels)
+
+    def counter_value(self, name, **labels):
+        with self.lock: return self.counters.get(name, {}).get(self._key(labels), 0)
+
+    @staticmethod
+    def _format_labels(labels, extra=None):
+        items = list(labels) + ([extra] if extra else [])
+        if not items: return ""
+        escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in items)
+        return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+    def _render_family(self, lines, name, kind, help_text, samples):
+        full = self.prefix + name
+        if help_text: lines.append(f"# HELP {full} {help_text}")
+        lines.append(f"# TYPE {full} {kind}")
+        for labels, value in samples:
+            labels = self._key(labels) if isinstance(labels, dict) else labels
+            if kind != "histogram": lines.append(f"{full}{self._format_labels(labels)} {value}"); continue
+            for bound, cumulative in value["buckets"]:
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{full}_bucket{self._format_labels(labels, ('le', le))} {cumulative}")
+            lines.append(f"{full}_sum{self._format_labels(labels)} {value['sum']}"); lines.append(f"{full}_count{self._format_labels(labels)} {value['count']}")
+
+    def render(self):
+        """ Prometheus metin biçimi (text/plain; version=0.0.4) """
+        lines = []
+        with self.lock:
+            counters = {name: sorted(series.items()) for name, series in self.counters.items()}
+            histograms = {name: sorted(series.items()) for name, series in self.histograms.items()}
+        for name, series in sorted(counters.items()): self._render_family(lines, name, "counter", self.help.get(name), series)
+        for name, series in sorted(histograms.items()): self._render_family(lines, name, "histogram", self.help.get(name), [(k, h.snapshot()) for k, h in series])
+        for collector in self.collectors:
+            try: families = collector()
+            except Exception as e: print(f"⚠️ Metrik toplayıcı hatası: {e}"); continue
+            for name, kind, help_text, samples in families: self._render_family(lines, name, kind, help_text, samples)
+        return "\n".join(lines) + "\n"
+
+class _MetricTimer:
+    def __init__(self, registry, name, labels): self.registry = registry; self.name = name; self.labels = labels
+    def __enter__(self): self.start = time.perf_counter(); return self
+    def __exit__(self, *exc): self.registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+
+metrics = MetricsRegistry()
+metrics.describe("http_request_duration_seconds", "HTTP isteği işleme süresi (rota bazında)")
+metrics.describe("http_requests_total", "HTTP istekleri (rota ve durum kodu bazında)")
+metrics.describe("command_duration_seconds", "Telegram komutu işleme süresi")
+metrics.describe("commands_total", "İşlenen Telegram komutları")
+metrics.describe("signals_ingested_total", "Kaydedilen sinyaller")
+metrics.describe("telegram_messages_total", "Gönderilen/gönderilemeyen Telegram mesajları (parçalara bölünmeden önce)")
+metrics.describe("telegram_retries_total", "Telegram API tekrar denemeleri (sebep bazında)")
+metrics.describe("telegram_dropped_total", "Kuyruk dolu olduğu için düşürülen Telegram mesajları")
+metrics.describe("json_load_duration_seconds", "Analiz JSON dosyası okuma+ayrıştırma süresi")
+metrics.describe("json_load_errors_total", "Okunamayan/bozuk analiz JSON dosyası sürümleri")
+metrics.describe("signal_days_archived_total", "gzip arşivine taşınan sinyal günleri")
+metrics.describe("signals_compacted_total", "Arşivlenirken atılan tekrar sinyaller")
+
+class SamplingProfiler:
+    """ Çalışma anında açılıp kapatılabilen örnekleyici profiler: arka plan thread'i her `interval` sn'de tüm thread'lerin
+    yığınını okur ve sayar. Çıktı flamegraph araçlarının okuduğu "collapsed stack" biçimindedir ("a;b;c sayı"). """
+    def __init__(self):
+        self.lock = threading.Lock(); self.thread = None; self.stop_event = threading.Event()
+        self.stacks = {}; self.samples = 0; self.interval = 0.01; self.started_at = None
+
+    @property
+    def running(self): return self.thread is not None
+
+    def start(self, interval=0.01):
+        with self.lock:
+            if self.thread is not None: return False
+            self.interval = max(0.001, float(interval)); self.stacks = {}; self.samples = 0; self.started_at = time.time(); self.stop_event.clear()
+            self.thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True); self.thread.start()
+        print(f"🔬 Profiler başlatıldı (aralık {self.interval * 1000:.1f} ms)")
+        return True
+
+    def stop(self):
+        with self.lock: thread = self.thread; self.thread = None
+        if thread is None: return False
+        self.stop_event.set(); thread.join(5); print(f"🔬 Profiler durduruldu ({self.samples} örnek)")
+        return True
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own: continue
+                parts = []
+                while frame is not None:
+                    code = frame.f_code; parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"); frame = frame.f_back
+                stack = ";".join(reversed(parts))
+                with self.lock: self.stacks[stack] = self.stacks.get(stack, 0) + 1
+            with self.lock: self.samples += 1
+
+    def report(self, limit=200):
+        """ En çok örneklenen `limit` yığın, collapsed stack biçiminde """
+        with self.lock: stacks = sorted(self.stacks.items(), key=lambda kv: -kv[1])[:limit]; samples = self.samples
+        header = f"# samples={samples} interval={self.interval} running={self.running}\n"
+        return header + "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+profiler = SamplingProfiler()
+
+class TelegramClient:
+    """ Telegram Bot API istemcisi: kalıcı (keep-alive) bağlantı havuzlu tek Session, ayrı bağlanma/okuma zaman aşımları ve istek metrikleri. """
+    def __init__(self, token, api_base=TELEGRAM_API_BASE, pool_size=TELEGRAM_WORKERS + 1, connect_timeout=TELEGRAM_CONNECT_TIMEOUT, read_timeout=TELEGRAM_READ_TIMEOUT):
+        self.token = token; self.api_base = api_base; self.timeout = (connect_timeout, read_timeout)
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=False) # Tek host: api.telegram.org
+        self.session = requests.Session(); self.session.mount("https://", self.adapter); self.session.mount("http://", self.adapter)
+        self.latency = LatencyHistogram(); self.lock = threading.Lock()
+        self.requests_total = 0; self.errors_total = 0; self.status_counts = {}
+
+    def post(self, method, payload):
+        """ Bot API metodunu çağırır (örn. "sendMessage"); yanıtı döndürür, ağ hatalarını fırlatır """
+        start = time.perf_counter()
+        try: r = self.session.post(f"{self.api_base}/bot{self.token}/{method}", json=payload, timeout=self.timeout)
+        except requests.exceptions.RequestException: self.record(None, time.perf_counter() - start); raise
+        self.record(r.status_code, time.perf_counter() - start)
+        return r
+
+    def record(self, status_code, seconds):
+        """ Bir isteğin sonucunu metriklere ekler (status_code None ise ağ hatası). ASGI modundaki async gönderim de kullanır. """
+        self.latency.observe(seconds)
+        with self.lock:
+            self.requests_total += 1
+            if status_code is None: self.errors_total += 1
+            else: self.status_counts[status_code] = self.status_counts.get(status_code, 0) + 1
+
+    def stats(self):
+        """ İstek sayıları, havuz isabetleri (yeni bağlantı açmadan yapılan istekler) ve gecikme histogramı """
+        connections = 0
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None: connections += pool.num_connections
+        with self.lock: total = self.requests_total; errors = self.errors_total; statuses = dict(self.status_counts)
+        return {"requests": total, "errors": errors, "status_counts": statuses, "connections_opened": connections,
+                "pool_hits": max(0, total - errors - connections), "latency": self.latency.snapshot()}
+
+telegram_client = TelegramClient(BOT_TOKEN)
+
+def _telegram_retry_delay(status_code, read_json, attempt):
+    """ 429/5xx yanıtı tekrar denenecekse beklenecek süre, denenmeyecekse None. 429'da Telegram'ın retry_after değeri kullanılır. """
+    if not (status_code == 429 or status_code >= 500) or attempt >= TELEGRAM_MAX_RETRIES: return None
+    if status_code == 429:
+        try: return float(read_json().get("parameters", {}).get("retry_after"))
+        except (ValueError, TypeError, AttributeError): pass
+    return _retry_delay(attempt)
+
+def _retry_reason(status_code): return "rate_limited" if status_code == 429 else "server_error"
+
+def _post_telegram_chunk(chat_id, text, parse_mode):
+    """ Tek bir mesaj parçasını gönderir; 429/5xx ve ağ hatalarında geri çekilerek tekrar dener """
+    data = {"chat_id": chat_id, "text": text}
+    if parse_mode: data["parse_mode"] = parse_mode
+    attempt = 0
+    while True:
+        try:
+            r = telegram_client.post("sendMessage", data)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt >= TELEGRAM_MAX_RETRIES: raise
+            delay = _retry_delay(attempt); print(f"🔁 TG ağ hatası, {delay:.1f} sn sonra tekrar denenecek (Chat ID: {chat_id}): {e}")
+            metrics.inc("telegram_retries_total", reason="network"); time.sleep(delay); attempt += 1; continue
+        delay = _telegram_retry_delay(r.status_code, r.json, attempt)
+        if delay is not None:
+            print(f"🔁 TG {r.status_code} yanıtı, {delay:.1f} sn sonra tekrar denenecek (Chat ID: {chat_id})")
+            metrics.inc("telegram_retries_total", reason=_retry_reason(r.status_code)); time.sleep(delay); attempt += 1; continue
+        r.raise_for_status()
+        return r
+
+class _DeliveryJob:
+    """ Gönderilecek bir mesaj: parçaları ve gönderim durumu. Kuyrukta her adımda tek parça gönderilir. """
+    __slots__ = ("chat_id", "parse_mode", "avoid_self_notify", "parts", "sent", "ok")
+    def __init__(self, chat_id, msg, parse_mode="Markdown", avoid_self_notify=False):
+        self.chat_id = chat_id; self.parse_mode = parse_mode; self.avoid_self_notify = avoid_self_notify
+        self.parts = [p for p in iter_message_chunks(msg, markdown=(parse_mode == "Markdown")) if p.strip()]
+        self.sent = 0; self.ok = True
+
+    @property
+    def done(self): return not self.ok or self.sent >= len(self.parts)
+
+    def failure_notice(self, title, e, detail=""):
+        """ Kullanıcıya gönderilemeyen mesaj için yöneticiye gidecek uyarı (yöneticiye giden mesajlar için None) """
+        if not ADMIN_CHAT_ID or str(self.chat_id) == str(ADMIN_CHAT_ID) or self.avoid_self_notify: return None
+        return f"🚨 {title}\nChat ID: {self.chat_id}\nHata: {e}{detail}"
+
+    def finish(self):
+        metrics.inc("telegram_messages_total", result="sent" if self.ok else "failed")
+
+def _send_next_chunk(job, pace=False):
+    """ İşin sıradaki parçasını gönderir (pace=False ise sohbet aralığını zamanlayıcı beklemiştir). İş bittiyse True döndürür. """
+    if not job.done:
+        try:
+            if pace: _chat_pacer.wait(job.chat_id)
+            _global_rate_limiter.acquire()
+            r = _post_telegram_chunk(job.chat_id, job.parts[job.sent], job.parse_mode); job.sent += 1
+            print(f"📤 TG Gönderildi (Chat ID: {job.chat_id}): {r.status_code}")
+        except requests.exceptions.RequestException as e:
+            job.ok = False; print(f"🚨 TG gönderim hatası (Chat ID: {job.chat_id}): {e}")
+            notice = job.failure_notice("Kullanıcıya Gönderilemedi!", e)
+            if notice: send_telegram_message(ADMIN_CHAT_ID, notice, parse_mode=None, avoid_self_notify=True)
+        except Exception as e:
+            job.ok = False; print(f"🚨 Beklenmedik TG gönderim hatası (Chat ID: {job.chat_id}): {e}")
+            notice = job.failure_notice("Beklenmedik Hata (TG Gönderim)!", e, f"\n{traceback.format_exc()}")
+            if notice: send_telegram_message(ADMIN_CHAT_ID, notice, parse_mode=None, avoid_self_notify=True)
+    if not job.done: return False
+    job.finish(); return True
+
+def deliver_telegram_message(chat_id, msg, parse_mode="Markdown", avoid_self_notify=False):
+    """ Mesajı hemen (çağıran thread içinde) gönderir. Başarı durumunu döndürür. """
+    if not BOT_TOKEN or not chat_id: print("🚨 TG gönderimi: BOT_TOKEN/chat_id eksik!"); return False
+    job = _DeliveryJob(chat_id, msg, parse_mode, avoid_self_notify)
+    while not _send_next_chunk(job, pace=True): pass
+    return job.ok
+
+class _ChatScheduler:
+    """ Sohbet başına sıralı, hız sınırını worker tutmadan uygulayan gönderim kuyruğu.
+    Her sohbetin kendi sırası (deque) vardır; gönderilecek işi olan sohbetler bir sonraki zaman dilimine göre bir yığında (heap)
+    tutulur. Worker yalnızca zamanı gelmiş sohbetin sıradaki işini alır, bir parça gönderir ve sohbeti bir sonraki dilimiyle yığına
+    geri koyar: aralık beklemesi olan sohbet (ör. uyarı selindeki yönetici sohbeti) diğer sohbetleri bekletmez. Bir sohbet aynı
+    anda tek worker'dadır, sohbet içi sıra korunur. Toplam `capacity`, sohbet başına `per_chat` mesaj bekleyebilir. Thread-safe. """
+    def __init__(self, capacity, per_chat, pacer):
+        self.capacity = capacity; self.per_chat = min(per_chat, capacity); self.pacer = pacer
+        self.chats = {} # sohbet -> bekleyen işler (worker'daki sohbetin sırası boş olabilir)
+        self.heap = [] # (hazır olma zamanı, sıra no, sohbet): worker'da olmayan ve işi bekleyen sohbetler
+        self.size = 0 # Bitmemiş mesajlar (worker'dakiler dahil)
+        self.seq = itertools.count(); self.lock = threading.Lock(); self.ready = threading.Condition(self.lock)
+
+    def _schedule(self, chat_id):
+        heapq.heappush(self.heap, (time.monotonic() + self.pacer.reserve(chat_id), next(self.seq), chat_id))
+        self.ready.notify()
+
+    def put(self, chat_id, job):
+        """ İşi sohbetin sırasına ekler; kapasite (toplam ya da sohbet) doluysa False döndürür """
+        chat_id = str(chat_id)
+        with self.lock:
+            jobs = self.chats.get(chat_id)
+            if self.size >= self.capacity or (jobs is not None and len(jobs) >= self.per_chat): return False
+            if jobs is None: jobs = self.chats[chat_id] = deque(); self._schedule(chat_id) # Boştaki sohbet için zaman dilimi ayrılır
+            jobs.append(job); self.size += 1
+            return True
+
+    def take(self):
+        """ Zamanı gelmiş ilk sohbetin sıradaki işini alır: (sohbet, iş) ya da (None, beklenecek sn; yığın boşsa None).
+        Çağıran self.lock'u tutmalıdır. """
+        if not self.heap: return None, None
+        delay = self.heap[0][0] - time.monotonic()
+        if delay > 0: return None, delay
+        chat_id = heapq.heappop(self.heap)[2]
+        return chat_id, self.chats[chat_id].popleft()
+
+    def release(self, chat_id, job, finished):
+        """ take() ile alınan işi geri verir: bitmediyse sohbetin başına döner; sohbetin işi kaldıysa bir sonraki dilimle yığına girer """
+        with self.lock:
+            jobs = self.chats[chat_id]
+            if finished: self.size -= 1
+            else: jobs.appendleft(job)
+            if jobs: self._schedule(chat_id)
+            else: del self.chats[chat_id]
+
+# --- Telegram Gönderim Kuyruğu ---
+# Mesajlar sohbet bazında zamanlanır (_ChatScheduler); HTTP istekleri worker thread'lerinde yapılır.
+_delivery_scheduler = None; _delivery_threads = []; _delivery_lock = threading.Lock(); _delivery_stopping = False
+_async_delivery = None # ASGI modunda olay döngüsündeki AsyncTelegramDelivery
+
+def _delivery_worker(scheduler):
+    while True:
+        with scheduler.ready:
+            while True:
+                chat_id, job = scheduler.take()
+                if chat_id is not None: break
+                if job is None and _delivery_stopping: return # Kapanış: bekleyen sohbet kalmadı
+                scheduler.ready.wait(job) # İş yoksa take() beklenecek süreyi döndürür
+        finished = True
+        try: finished = _send_next_chunk(job)
+        except Exception as e: print(f"💥 TG gönderim worker hatası: {e}\n{traceback.format_exc()}")
+        finally: scheduler.release(chat_id, job, finished)
+
+def _start_delivery_workers():
+    """ Worker'ları başlatır ve zamanlayıcıyı döndürür. Zamanlayıcı thread'lerle birlikte tek adımda yayımlanır. """
+    global _delivery_scheduler, _delivery_threads
+    with _delivery_lock:
+        if _delivery_threads: return _delivery_scheduler
+        scheduler = _ChatScheduler(TELEGRAM_QUEUE_SIZE, TELEGRAM_CHAT_QUEUE_SIZE, _chat_pacer)
+        threads = [threading.Thread(target=_delivery_worker, args=(scheduler,), name=f"tg-delivery-{i}", daemon=True) for i in range(TELEGRAM_WORKERS)]
+        for t in threads: t.start()
+        _delivery_scheduler = scheduler; _delivery_threads = threads # Önce zamanlayıcı: _delivery_threads doluysa zamanlayıcı da hazırdır
+        return scheduler
+
 def send_telegram_message(chat_id, msg, parse_mode="Markdown", avoid_self_notify=False):
+    """ Mesajı gönderim kuyruğuna ekler ve hemen döner (TELEGRAM_ASYNC_DELIVERY=0 ise senkron gönderir) """
     if not BOT_TOKEN or not chat_id: print("🚨 TG gönderimi: BOT_TOKEN/chat_id eksik!"); return False
-    msg = str(msg); max_length = 4096; messages_to_send = []
-    if len(msg.encode('utf-8')) > max_length:
-        parts = msg.split('\n\n'); current_message = ""
-        for part in parts:
-            part_len = len(part.encode('utf-8')); current_len = len(current_message.encode('utf-8'))
-            if part_len >= max_length - 50:
-                if current_message: messages_to_send.append(current_message.strip())
-                current_message = ""; start = 0
-                while start < len(part):
-                    split_point = -1; search_end = min(start + max_length - 50, len(part))
-                    rfind_space = part.rfind(' ', start, search_end); rfind_newline = part.rfind('\n', start, search_end)
-                    split_point = max(rfind_space, rfind_newline)
-                    if split_point <= start or split_point < start + 50: split_point = search_end
-                    messages_to_send.append(part[start:split_point]); start = split_point
-                    if start < len(part) and part[start] in (' ', '\n'): start += 1
-            elif current_len + part_len + 2 <= max_length: current_message += part + "\n\n"
-            else: messages_to_send.append(current_message.strip()); current_message = part + "\n\n"
-        if current_message: messages_to_send.append(current_message.strip())
-    else: messages_to_send.append(msg)
-    all_sent_successfully = True
-    for message_part in messages_to_send:
-         if not message_part.strip(): continue
-         try:
-             url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"; data = {"chat_id": chat_id, "text": message_part}
-             if parse_mode: data["parse_mode"] = parse_mode
-             r = requests.post(url, json=data, timeout=20); r.raise_for_status()
-             print(f"📤 TG Gönderildi (Chat ID: {chat_id}): {r.status_code}"); time.sleep(0.6)
-         except requests.exceptions.RequestException as e:
-             all_sent_successfully = False; print(f"🚨 TG gönderim hatası (Chat ID: {chat_id}): {e}")
-             if ADMIN_CHAT_ID and str(chat_id) != str(ADMIN_CHAT_ID) and not avoid_self_notify: send_telegram_message(ADMIN_CHAT_ID, f"🚨 Kullanıcıya Gönderilemedi!\nChat ID: {chat_id}\nHata: {e}", parse_mode=None, avoid_self_notify=True); break
-         except Exception as e:
-             all_sent_successfully = False; print(f"🚨 Beklenmedik TG gönderim hatası (Chat ID: {chat_id}): {e}")
-             if ADMIN_CHAT_ID and str(chat_id) != str(ADMIN_CHAT_ID) and not avoid_self_notify: send_telegram_message(ADMIN_CHAT_ID, f"🚨 Beklenmedik Hata (TG Gönderim)!\nChat ID: {chat_id}\nHata: {e}\n{traceback.format_exc()}", parse_mode=None, avoid_self_notify=True); break
-    return all_sent_successfully
+    if not TELEGRAM_ASYNC_DELIVERY or _delivery_stopping: return deliver_telegram_message(chat_id, msg, parse_mode, avoid_self_notify)
+    if _async_delivery is not None: return _async_delivery.submit(chat_id, msg, parse_mode, avoid_self_notify) # ASGI modu
+    scheduler = _delivery_scheduler if _delivery_threads else _start_delivery_workers()
+    if scheduler.put(chat_id, _DeliveryJob(chat_id, msg, parse_mode, avoid_self_notify)): return True
+    print(f"🚨 TG gönderim kuyruğu dolu, mesaj düşürüldü (Chat ID: {chat_id})"); metrics.inc("telegram_dropped_total"); return False
+
+def flush_telegram_queue(timeout=TELEGRAM_SHUTDOWN_TIMEOUT):
+    """ Kapanışta kuyruktaki mesajların gönderilmesini bekler (en fazla `timeout` sn) """
+    global _delivery_stopping
+    with _delivery_lock:
+        if _delivery_stopping or not _delivery_threads: return
+        _delivery_stopping = True
+    deadline = time.monotonic() + timeout; scheduler = _delivery_scheduler
+    if scheduler.size: print(f"⏳ Kapanış: {scheduler.size} TG mesajı gönderiliyor...")
+    with scheduler.ready: scheduler.ready.notify_all()
+    for t in _delivery_threads: t.join(max(0.0, deadline - time.monotonic()))
+    if scheduler.size: print(f"⚠️ Kapanış: {scheduler.size} TG mesajı gönderilemeden kaldı.")
+
+atexit.register(flush_telegram_queue)
+
+# --- ASGI Modu: Async Telegram Gönderimi ---
+# ASGI modunda gönderim olay döngüsünde yapılır: thread modundakiyle aynı sohbet bazlı zamanlayıcı (_ChatScheduler),
+# httpx.AsyncClient ve aynı hız sınırlayıcılar/tekrar deneme kuralları. Bekleyen mesajlar ne thread ne de worker tutar.
+class AsyncTelegramDelivery:
+    """ Olay döngüsünde çalışan Telegram gönderici. submit() herhangi bir thread'den çağrılabilir. """
+    def __init__(self, workers=TELEGRAM_WORKERS, scheduler=None):
+        self.workers = workers; self.scheduler = scheduler or _ChatScheduler(TELEGRAM_QUEUE_SIZE, TELEGRAM_CHAT_QUEUE_SIZE, _chat_pacer)
+        self.loop = None; self.http = None; self.wakeup = None; self.tasks = []
+
+    async def start(self):
+        import httpx # Yalnızca ASGI modunda gerekir
+        self.loop = asyncio.get_running_loop(); self.wakeup = asyncio.Event()
+        self.http = httpx.AsyncClient(timeout=httpx.Timeout(TELEGRAM_READ_TIMEOUT, connect=TELEGRAM_CONNECT_TIMEOUT),
+                                      limits=httpx.Limits(max_connections=self.workers + 1, max_keepalive_connections=self.workers + 1))
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def submit(self, chat_id, msg, parse_mode="Markdown", avoid_self_notify=False):
+        """ Mesajı sohbetin sırasına ekler; sıra doluysa mesaj düşürülür ve False döner (thread modundaki gibi) """
+        if not self.scheduler.put(chat_id, _DeliveryJob(chat_id, msg, parse_mode, avoid_self_notify)):
+            print(f"🚨 TG gönderim kuyruğu dolu, mesaj düşürüldü (Chat ID: {chat_id})"); metrics.inc("telegram_dropped_total"); return False
+        try: running = asyncio.get_running_loop()
+        except RuntimeError: running = None
+        if running is self.loop: self.wakeup.set()
+        else: self.loop.call_soon_threadsafe(self.wakeup.set)
+        return True
+
+    async def _worker(self):
+        scheduler = self.scheduler
+        while True:
+            self.wakeup.clear() # take()'ten sonra eklenen iş wakeup'ı yeniden kurar
+            with scheduler.lock: chat_id, job = scheduler.take()
+            if chat_id is None:
+                try: await asyncio.wait_for(self.wakeup.wait(), job) # İş yoksa take() beklenecek süreyi döndürür
+                except asyncio.TimeoutError: pass
+                continue
+            finished = True
+            try: finished = await self._send_next_chunk(job)
+            except Exception as e: print(f"💥 TG gönderim worker hatası: {e}\n{traceback.format_exc()}")
+            finally: scheduler.release(chat_id, job, finished); self.wakeup.set()
+
+    async def _post_chunk(self, chat_id, text, parse_mode):
+        """ _post_telegram_chunk'ın async karşılığı: aynı 429/5xx ve ağ hatası tekrar deneme kuralları """
+        import httpx
+        data = {"chat_id": chat_id, "text": text}
+        if parse_mode: data["parse_mode"] = parse_mode
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try: r = await self.http.post(f"{TELEGRAM_API_BASE}/bot{BOT_TOKEN}/sendMessage", json=data)
+            except httpx.TransportError as e:
+                telegram_client.record(None, time.perf_counter() - start)
+                if attempt >= TELEGRAM_MAX_RETRIES: raise
+                delay = _retry_delay(attempt); print(f"🔁 TG ağ hatası, {delay:.1f} sn sonra tekrar denenecek (Chat ID: {chat_id}): {e}")
+                metrics.inc("telegram_retries_total", reason="network"); await asyncio.sleep(delay); attempt += 1; continue
+            telegram_client.record(r.status_code, time.perf_counter() - start)
+            delay = _telegram_retry_delay(r.status_code, r.json, attempt)
+            if delay is not None:
+                print(f"🔁 TG {r.status_code} yanıtı, {delay:.1f} sn sonra tekrar denenecek (Chat ID: {chat_id})")
+                metrics.inc("telegram_retries_total", reason=_retry_reason(r.status_code)); await asyncio.sleep(delay); attempt += 1; continue
+            r.raise_for_status()
+            return r
+
+    async def _send_next_chunk(self, job):
+        """ _send_next_chunk'ın async karşılığı: işin sıradaki parçasını gönderir, iş bittiyse True döndürür """
+        if not job.done:
+            try:
+                await asyncio.sleep(_global_rate_limiter.reserve())
+                r = await self._post_chunk(job.chat_id, job.parts[job.sent], job.parse_mode); job.sent += 1
+                print(f"📤 TG Gönderildi (Chat ID: {job.chat_id}): {r.status_code}")
+            except Exception as e:
+                job.ok = False; print(f"🚨 TG gönderim hatası (Chat ID: {job.chat_id}): {e}")
+                notice = job.failure_notice("Kullanıcıya Gönderilemedi!", e)
+                if notice: self.submit(ADMIN_CHAT_ID, notice, parse_mode=None, avoid_self_notify=True)
+        if not job.done: return False
+        job.finish(); return True
+
+    async def close(self, timeout=TELEGRAM_SHUTDOWN_TIMEOUT):
+        """ Kuyruktaki mesajların gönderilmesini bekler (en fazla `timeout` sn), worker'ları ve HTTP istemcisini kapatır """
+        scheduler = self.scheduler; deadline = time.monotonic() + timeout
+        if scheduler.size: print(f"⏳ Kapanış: {scheduler.size} TG mesajı gönderiliyor...")
+        while scheduler.size and time.monotonic() < deadline: await asyncio.sleep(0.05)
+        if scheduler.size: print(f"⚠️ Kapanış: {scheduler.size} TG mesajı gönderilemeden kaldı.")
+        for t in self.tasks: t.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        await self.http.aclose()
 
 def simplify_exchange(exchange_name):
     name = str(exchange_name).upper();
@@ -96,6 +787,658 @@ def simplify_exchange(exchange_name):
     mapping = {"NASDAQ": "NASDAQ", "NYSE": "NYSE", "BINANCE": "BINANCE", "OKX": "OKX", "BYBIT": "BYBIT", "KUCOIN": "KUCOIN", "GEMINI":"GEMINI", "KRAKEN":"KRAKEN", "COINBASE":"COINBASE"}
     return mapping.get(name, exchange_name)
 
+_MARKDOWN_SPECIAL_RE = re.compile(r'([_*`\[])')
+
+def escape_markdown(text):
+    """ Telegram Markdown (eski sürüm) için varlık dışındaki _ * ` [ karakterlerini kaçışlar """
+    return _MARKDOWN_SPECIAL_RE.sub(r'\\\1', str(text))
+
+def markdown_emphasis(text, marker):
+    """ Metni marker (* ya da _) ile vurgular. Eski Markdown varlık içinde kaçışa izin vermez: özel karakter içeren metin kaçışlanıp düz bırakılır """
+    text = str(text)
+    return escape_markdown(text) if _MARKDOWN_SPECIAL_RE.search(text) else f"{marker}{text}{marker}"
+
+def format_signal_message(symbol, exchange, signal_text):
+    """ Yöneticiye giden tek sinyal bildirimi """
+    return f"📡 Yeni Sinyal Geldi:\n\n{markdown_emphasis(symbol, '*')} ({escape_markdown(simplify_exchange(exchange))})\n📍 {markdown_emphasis(str(signal_text).strip(), '_')}"
+
+# --- Yönetici Sinyal Bildirimleri ---
+class SignalDigest:
+    """ Yönetici sinyal bildirimlerini pencere boyunca biriktirir ve borsa/sinyal tipine göre gruplanmış tek mesaj olarak gönderir.
+    window <= 0 ise her ekleme hemen gönderilir (tek sinyal eski formatta). """
+    def __init__(self, window, max_signals, dedup):
+        self.window = window; self.max_signals = max(1, max_signals); self.dedup = dedup
+        self.lock = threading.Lock(); self.pending = []; self.seen = set(); self.duplicates = 0; self.timer = None
+
+    def add(self, symbol, exchange, signal_text): self.add_many([(symbol, exchange, signal_text)])
+
+    def add_many(self, signals):
+        batches = []
+        with self.lock:
+            for symbol, exchange, signal_text in signals:
+                key = (str(symbol).upper(), str(signal_text).strip().lower())
+                if self.dedup and key in self.seen: self.duplicates += 1; continue
+                self.seen.add(key); self.pending.append((symbol, exchange, signal_text))
+                if len(self.pending) >= self.max_signals: batches.append(self._take())
+            if self.pending:
+                if self.window <= 0: batches.append(self._take())
+                elif self.timer is None:
+                    self.timer = threading.Timer(self.window, self.flush); self.timer.daemon = True; self.timer.start()
+        for batch in batches: self._send(*batch)
+
+    def _take(self):
+        """ Bekleyen sinyalleri alır ve pencereyi sıfırlar. self.lock tutulurken çağrılmalı. """
+        batch = (self.pending, self.duplicates); self.pending = []; self.seen = set(); self.duplicates = 0
+        if self.timer is not None: self.timer.cancel(); self.timer = None
+        return batch
+
+    def flush(self):
+        """ Bekleyen sinyalleri hemen gönderir (pencere dolduğunda ve kapanışta) """
+        with self.lock:
+            if not self.pending: self.timer = None; return
+            batch = self._take()
+        self._send(*batch)
+
+    def _send(self, signals, duplicates):
+        if not ADMIN_CHAT_ID: print("⚠️ ADMIN_CHAT_ID ayarlanmadı, sinyal gönderilemedi."); return
+        if len(signals) == 1 and not duplicates: send_telegram_message(ADMIN_CHAT_ID, format_signal_message(*signals[0]), parse_mode="Markdown"); return
+        send_telegram_message(ADMIN_CHAT_ID, format_signal_digest(signals, duplicates), parse_mode="Markdown")
+
+def format_signal_digest(signals, duplicates=0):
+    """ Sinyalleri borsa ve sinyal metnine göre gruplar; her borsa ayrı paragraf olduğu için mesaj bölünürken gruplar korunur """
+    groups = {}
+    for symbol, exchange, signal_text in signals:
+        groups.setdefault(simplify_exchange(exchange), {}).setdefault(str(signal_text).strip(), []).append(str(symbol))
+    parts = [f"📡 {len(signals)} Yeni Sinyal Geldi:"]
+    for exchange, by_signal in groups.items():
+        parts.append(f"{markdown_emphasis(exchange, '*')}\n" + "\n".join(f"📍 {markdown_emphasis(signal_text, '_')}: {escape_markdown(', '.join(symbols))}" for signal_text, symbols in by_signal.items()))
+    if duplicates: parts.append(f"♻️ {duplicates} tekrar eden sinyal birleştirildi.")
+    return "\n\n".join(parts)
+
+signal_digest = SignalDigest(SIGNAL_DIGEST_WINDOW, SIGNAL_DIGEST_MAX, SIGNAL_DIGEST_DEDUP)
+atexit.register(signal_digest.flush) # TG kuyruğu boşaltılmadan önce çalışır (atexit ters sırada)
+
+# --- Sinyal Sınıflandırma ---
+_SIGNAL_NUMBER_RE = re.compile(r'([-+]?\d*[,.]?\d+)')
+
+def classify_signal(signal_data):
+    """ Sinyali /ozet kategorisine ayırır. (kategori, özet satırı) ya da hiçbir kategoriye girmiyorsa None döndürür. """
+    symbol = signal_data.get("symbol", "?"); exchange_simp = simplify_exchange(signal_data.get("exchange", "?"))
+    signal_text = str(signal_data.get("signal", "")).strip(); lower_signal = signal_text.lower()
+    if "kairi" in lower_signal and "seviyesinde" in lower_signal:
+        kairi_match = _SIGNAL_NUMBER_RE.search(signal_text.replace(',', '.'))
+        if kairi_match:
+            try: kairi_val = float(kairi_match.group(1))
+            except ValueError: kairi_val = None
+            if kairi_val is not None and kairi_val <= -20:
+                entry = f"{symbol} ({exchange_simp}): KAIRI {kairi_val:.2f}".replace('.',',')
+                return ("kairi_neg30" if kairi_val <= -30 else "kairi_neg20"), entry
+    if "matisay" in lower_signal and ("değerinde" in lower_signal or "kesti" in lower_signal):
+        matisay_match = _SIGNAL_NUMBER_RE.search(signal_text.replace(',', '.'))
+        if matisay_match:
+            try: matisay_val = float(matisay_match.group(1))
+            except ValueError: matisay_val = None
+            if matisay_val is not None and matisay_val < -25:
+                return "matisay_neg25", f"{symbol} ({exchange_simp}): Matisay {matisay_val:.2f}".replace('.',',')
+    entry = f"{symbol} ({exchange_simp}): {signal_text}"
+    if "mükemmel alış" in lower_signal: return "mukemmel_alis", entry
+    if "alış sayımı" in lower_signal: return "alis_sayim", entry
+    if "mükemmel satış" in lower_signal: return "mukemmel_satis", entry
+    if "satış sayımı" in lower_signal: return "satis_sayim", entry
+    return None
+
+def summary_keys_for(exchange):
+    """ Sinyalin katkı verdiği özet anahtarları: tümü ("*"), borsanın kendisi ve BIST* için "BIST" """
+    exchange_upper = str(exchange).upper(); keys = {"*", exchange_upper}
+    if exchange_upper.startswith("BIST"): keys.add("BIST")
+    return keys
+
+# --- Sinyal Kaydı ---
+class _CommitBatch:
+    """ Aynı anda diske yazılacak satırlar ve bekleyenler için tamamlanma işareti """
+    __slots__ = ("items", "done", "error")
+    def __init__(self): self.items = []; self.done = threading.Event(); self.error = None
+
+class SignalStore:
+    """ Günlere bölünmüş, sadece eklemeli sinyal kaydı.
+    signals.json -> signals-YYYY-MM-DD.json (sinyaller). Her gün için /ozet sayımları ve kategorileri sinyal geldikçe güncellenir;
+    yeniden başlatmada ilk istekte kayıttan yeniden kurulur (sayım da bu özetten okunur).
+    Yazımlar tek bir yazıcı thread'inde yapılır (group commit): kısa pencere içinde gelen satırlar tek seferde yazılır, satırlar asla karışmaz.
+    Birden çok süreç aynı kaydı paylaşabilir: yazımlar signals.lock üzerinde flock ile sıralanır, bellekteki özetler diğer
+    süreçlerin eklediği satırları dosya sonundan okuyarak tamamlar. Dosya silen işlemler (clear, arşivleme) lock dosyasındaki nesil
+    sayısını artırır; diğer süreçler bunu görünce önbelleklerini ve açık dosyalarını bırakır. """
+    MAX_CACHED_DAYS = 7
+    COMMIT_TIMEOUT = 30.0
+
+    def __init__(self, base_path):
+        self.base_path = base_path; root, ext = os.path.splitext(base_path); self.root = root; self.ext = ext or ".json"
+        self.lock = threading.Lock()
+        self.summaries = {} # gün -> {özet anahtarı: {"count": n, "kategoriler": {kategori: [satır, ...]}}}
+        self.legacy_checked = False
+        self.handles = {} # gün -> açık veri dosyası; sadece yazıcı thread'i kullanır
+        self.pending_cond = threading.Condition(); self.pending_batch = _CommitBatch(); self.writer = None; self.stopping = False
+        self.maintenance = None; self.maintenance_stop = threading.Event(); self.archive_lock = threading.RLock() # Arşivleme turları ve clear sırayla çalışır
+        self.lock_path = f"{root}.lock"; self.lock_file = None; self.lock_depth = 0; self.generation = None
+        self.summary_offsets = {} # gün -> özetin okuduğu aktif dosya baytı
+        self.commit_window = SIGNAL_LOG_COMMIT_WINDOW_MS / 1000.0; self.fsync_policy = SIGNAL_LOG_FSYNC; self.last_fsync = time.monotonic()
+
+    def partition_path(self, day): return f"{self.root}-{day}{self.ext}"
+    def archive_path(self, day): return f"{self.root}-{day}{self.ext}.gz"
+    def index_path(self, day): return f"{self.root}-{day}.idx" # Eski sürümlerin ofset indeksi; yalnızca temizlik için
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """ Süreçler arası yazım kilidi (lock dosyasında flock; POSIX dışında yalnızca süreç içi). İç içe kullanılabilir; self.lock tutulurken çağrılmalı. """
+        if self.lock_file is None: self.lock_file = open(self.lock_path, "a+b")
+        if self.lock_depth == 0 and fcntl is not None: fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_EX)
+        self.lock_depth += 1
+        try: yield
+        finally:
+            self.lock_depth -= 1
+            if self.lock_depth == 0 and fcntl is not None: fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _read_generation(self):
+        if self.lock_file is None: self.lock_file = open(self.lock_path, "a+b")
+        self.lock_file.seek(0); raw = self.lock_file.read().strip()
+        return int(raw) if raw.isdigit() else 0
+
+    def _bump_generation(self):
+        """ Dosya silen/değiştiren işlemden sonra: diğer süreçler önbelleklerini yeniler. Dosya kilidi tutulurken çağrılmalı. """
+        generation = self._read_generation() + 1
+        self.lock_file.truncate(0); self.lock_file.write(str(generation).encode()); self.lock_file.flush()
+        self._reset_caches(generation)
+
+    def _sync_generation(self):
+        """ Başka bir süreç dosya sildiyse önbellekleri ve açık dosyaları bırakır. self.lock tutulurken çağrılmalı. """
+        generation = self._read_generation()
+        if generation != self.generation: self._reset_caches(generation)
+
+    def _reset_caches(self, generation):
+        self._close_handles(); self.summaries.clear(); self.summary_offsets.clear()
+        self.generation = generation
+
+    def append(self, data_dict):
+        """ Tek sinyali kaydeder (yazıldıktan sonra döner) """
+        self.append_many([data_dict])
+
+    def append_many(self, data_dicts):
+        """ Sinyalleri yazıcı kuyruğuna ekler ve içinde bulundukları yazım grubu diske yazılana kadar bekler """
+        items = []
+        for data_dict in data_dicts:
+            data_dict['server_timestamp'] = datetime.now().isoformat()
+            line = (json.dumps(data_dict, ensure_ascii=False) + "\n").encode("utf-8")
+            exchange = data_dict.get("exchange", ""); classified = classify_signal(data_dict) # Sınıflandırma kayıt anında bir kez yapılır
+            items.append((data_dict['server_timestamp'][:10], line, summary_keys_for(exchange), classified))
+        if not items: return
+        if self.writer is None: self._start_writer()
+        with self.pending_cond:
+            if self.stopping: raise RuntimeError("Sinyal yazıcısı kapatıldı")
+            batch = self.pending_batch; batch.items.extend(items); self.pending_cond.notify()
+        if not batch.done.wait(self.COMMIT_TIMEOUT): raise TimeoutError("Sinyal yazımı zaman aşımına uğradı")
+        if batch.error: raise batch.error
+
+    def _start_writer(self):
+        with self.pending_cond:
+            if self.writer is not None: return
+            self.writer = threading.Thread(target=self._writer_loop, name="signal-log-writer", daemon=True); self.writer.start()
+            if SIGNAL_ARCHIVE_INTERVAL > 0:
+                self.maintenance = threading.Thread(target=_archive_maintenance_loop, args=(self,), name="signal-log-archiver", daemon=True); self.maintenance.start()
+
+    def _writer_loop(self):
+        while True:
+            with self.pending_cond:
+                if not self.pending_batch.items and not self.stopping:
+                    self.pending_cond.wait(SIGNAL_LOG_FSYNC_INTERVAL if self.fsync_policy == "interval" else None)
+                idle = not self.pending_batch.items
+                if idle and self.stopping: break
+            if idle: self._maybe_fsync(); continue
+            if self.commit_window > 0 and not self.stopping: time.sleep(self.commit_window) # Pencere boyunca gelenler aynı gruba katılır
+            with self.pending_cond: batch = self.pending_batch; self.pending_batch = _CommitBatch()
+            try:
+                by_day = {}
+                for day, *rest in batch.items: by_day.setdefault(day, []).append(tuple(rest))
+                with self.lock, self._file_lock():
+                    self._sync_generation(); self._migrate_legacy_log()
+                    for day, lines in by_day.items(): self._write_lines(day, lines)
+                self._maybe_fsync(batch=True)
+            except Exception as e:
+                print(f"❌ Sinyal yazım grubu yazılamadı ({len(batch.items)} satır): {e}"); batch.error = e
+            finally: batch.done.set()
+        self._maybe_fsync(force=True)
+        with self.lock: self._close_handles()
+
+    def _maybe_fsync(self, batch=False, force=False):
+        """ SIGNAL_LOG_FSYNC politikasına göre açık dosyaları diske zorlar """
+        if self.fsync_policy == "none": return
+        if not force and not (self.fsync_policy == "batch" and batch) and not (self.fsync_policy == "interval" and time.monotonic() - self.last_fsync >= SIGNAL_LOG_FSYNC_INTERVAL): return
+        with self.lock:
+            for data_f in self.handles.values(): os.fsync(data_f.fileno())
+        self.last_fsync = time.monotonic()
+
+    def _get_handle(self, day):
+        """ Günün veri dosyasını açık tutar; gün değişince eski günün dosyası kapatılır. self.lock tutulurken çağrılmalı. """
+        handle = self.handles.get(day)
+        if handle is None:
+            if len(self.handles) >= 2: self._close_handles(keep=max(self.handles))
+            handle = self.handles[day] = open(self.partition_path(day), "ab")
+        return handle
+
+    def _close_handles(self, keep=None):
+        for day in [d for d in self.handles if d != keep]: self.handles.pop(day).close()
+
+    def _write_lines(self, day, lines):
+        """ (satır baytları, özet anahtarları, sınıf) listesini günün dosyasına yazar. self.lock tutulurken çağrılmalı. """
+        with self._file_lock():
+            data_f = self._get_handle(day); offset = data_f.seek(0, os.SEEK_END)
+            # Bellekteki özet yalnızca dosyanın tamamını okumuşsa güncellenir; değilse (başka süreç yazdıysa) sonradan dosyadan tamamlanır
+            summary = self.summaries.get(day) if self.summary_offsets.get(day) == offset else None
+            for line, keys, classified in lines:
+                data_f.write(line); offset += len(line)
+                if summary is not None: self._add_to_summary(summary, keys, classified)
+            data_f.flush() # Okuyucular için işletim sistemine aktar
+            if summary is not None: self.summary_offsets[day] = offset
+
+    def close(self, timeout=10.0):
+        """ Bekleyen yazımları bitirip yazıcıyı durdurur """
+        self.maintenance_stop.set()
+        with self.pending_cond:
+            if self.writer is None or self.stopping: return
+            self.stopping = True; self.pending_cond.notify()
+        self.writer.join(timeout)
+
+    @staticmethod
+    def _add_to_summary(summary, keys, classified):
+        for key in keys:
+            bucket = summary.get(key)
+            if bucket is None: bucket = summary[key] = {"count": 0, "kategoriler": {}}
+            bucket["count"] += 1
+            if classified: bucket["kategoriler"].setdefault(classified[0], []).append(classified[1])
+
+    def _summarize_line(self, summary, line):
+        if not line.strip(): return
+        try: signal_data = json.loads(line)
+        except Exception as e: print(f"⚠️ Satır işlenirken hata: {e} - Satır: {line[:100]}"); return
+        self._add_to_summary(summary, summary_keys_for(signal_data.get("exchange", "")), classify_signal(signal_data))
+
+    def _load_summary(self, day):
+        """ Günün özetini bellekten getirir; yoksa arşivi ve gün dosyasını bir kez tarayıp kurar. Gün dosyasına (başka süreçlerce)
+        sonradan eklenen tam satırlar okunup özete eklenir. self.lock tutulurken çağrılmalı. """
+        summary = self.summaries.get(day)
+        if summary is None:
+            summary = self.summaries[day] = {}; self.summary_offsets[day] = 0
+            try:
+                with gzip.open(self.archive_path(day), "rb") as f:
+                    for line in f: self._summarize_line(summary, line)
+            except FileNotFoundError: pass
+            while len(self.summaries) > self.MAX_CACHED_DAYS: evicted = min(self.summaries); del self.summaries[evicted]; self.summary_offsets.pop(evicted, None)
+        consumed = self.summary_offsets.get(day, 0)
+        try: size = os.path.getsize(self.partition_path(day))
+        except FileNotFoundError: size = 0
+        if size > consumed:
+            with open(self.partition_path(day), "rb") as f:
+                f.seek(consumed)
+                for line in f:
+                    if not line.endswith(b"\n"): break # Yazımı süren satır; sonraki okumada
+                    consumed += len(line); self._summarize_line(summary, line)
+            self.summary_offsets[day] = consumed
+        return summary
+
+    def summary(self, day, exchange_filter=None):
+        """ Günün hazır özeti: (sinyal sayısı, {kategori: [satır, ...]}). Filtre: "BIST" tüm BIST* borsaları, diğerleri birebir borsa adı. """
+        with self.lock:
+            self._sync_generation(); self._migrate_legacy_log(); bucket = self._load_summary(day).get(exchange_filter or "*")
+            if not bucket: return 0, {}
+            return bucket["count"], {k: list(v) for k, v in bucket["kategoriler"].items()}
+
+    def _migrate_legacy_log(self):
+        """ Eski tek dosyalık signals.json varsa satırlarını gün dosyalarına taşır (bir kez) """
+        if self.legacy_checked: return
+        self.legacy_checked = True
+        if not os.path.exists(self.base_path) or os.path.getsize(self.base_path) == 0: return
+        with self._file_lock():
+            if os.path.exists(self.base_path): self._migrate_legacy_file() # Başka süreç taşımış olabilir
+
+    def _migrate_legacy_file(self):
+        by_day = {}
+        with open(self.base_path, "rb") as f:
+            for line in f:
+                if not line.strip(): continue
+                try: data = json.loads(line)
+                except Exception: continue
+                day = str(data.get("server_timestamp", ""))[:10] or date.today().isoformat()
+                exchange = data.get("exchange", "")
+                by_day.setdefault(day, []).append((line.rstrip(b"\n") + b"\n", summary_keys_for(exchange), classify_signal(data)))
+        for day, lines in by_day.items(): self._write_lines(day, lines)
+        os.replace(self.base_path, self.base_path + ".migrated")
+        print(f"📦 Eski sinyal kaydı gün dosyalarına taşındı: {sum(len(v) for v in by_day.values())} satır, {len(by_day)} gün")
+
+    def count(self, day, exchange_filter=None):
+        """ Günün (filtreye uyan) sinyal sayısı; /ozet özetinden okunur """
+        with self.lock:
+            self._sync_generation(); self._migrate_legacy_log(); bucket = self._load_summary(day).get(exchange_filter or "*")
+            return bucket["count"] if bucket else 0
+
+    def signals_for_day(self, day, exchange_filter=None):
+        """ Günün sinyallerini ekleniş sırasıyla döndürür. Filtre /ozet ile aynı: "BIST" tüm BIST* borsaları, diğerleri birebir borsa adı. """
+        with self.lock: self._sync_generation(); self._migrate_legacy_log()
+        signals = []
+        for line in self._iter_day_lines(day):
+            if not line.endswith(b"\n") or not line.strip(): continue # Yazımı süren satır
+            try: signal_data = json.loads(line)
+            except Exception as e: print(f"⚠️ Satır işlenirken hata: {e} - Satır: {line[:100]}"); continue
+            if exchange_filter and exchange_filter not in summary_keys_for(signal_data.get("exchange", "")): continue
+            signals.append(signal_data)
+        return signals
+
+    def _iter_day_lines(self, day):
+        """ Günün ham satırları: önce arşiv (gzip, akış halinde açılır), sonra aktif gün dosyası """
+        for path, opener in ((self.archive_path(day), gzip.open), (self.partition_path(day), open)):
+            try: f = opener(path, "rb")
+            except FileNotFoundError: continue
+            with f: yield from f
+
+    def has_day(self, day):
+        """ Gün için kayıt var mı (taşınmamış eski tek dosya önce gün dosyalarına taşınır) """
+        with self.lock: self._sync_generation(); self._migrate_legacy_log()
+        return os.path.exists(self.partition_path(day)) or os.path.exists(self.archive_path(day))
+
+    def archive_files(self): return glob.glob(f"{glob.escape(self.root)}-????-??-??{self.ext}.gz")
+
+    def _day_of(self, path): return path[len(self.root) + 1:len(self.root) + 11]
+
+    def compact_day(self, day):
+        """ Günün aktif dosyasını (varsa önceki arşivle birlikte) tekrarları atarak gzip arşivine yazar, aktif dosyayı siler.
+        Sıkıştırma kilit dışında yapılır; bu arada güne yeni satır yazıldıysa tur iptal edilir (sonraki turda tekrar denenir).
+        (tutulan, atılan) satır sayısı ya da iptalde None döndürür. """
+        path = self.partition_path(day); archive = self.archive_path(day); tmp = f"{archive}.{os.getpid()}.tmp" # Süreç başına geçici dosya
+        with self.lock:
+            handle = self.handles.pop(day, None)
+            if handle is not None: handle.close()
+            try: size = os.path.getsize(path)
+            except FileNotFoundError: return None
+        kept = dropped = 0; repeats = _RepeatFilter(SIGNAL_ARCHIVE_DEDUP_WINDOW)
+        with gzip.open(tmp, "wb", compresslevel=6) as out:
+            for line in self._iter_day_lines(day):
+                if not line.strip(): continue
+                try: data = json.loads(line)
+                except ValueError: data = None # Bozuk satırlar olduğu gibi tutulur
+                if data is not None and repeats.is_repeat(data): dropped += 1; continue
+                out.write(line if line.endswith(b"\n") else line + b"\n"); kept += 1
+        with open(tmp, "rb") as f: os.fsync(f.fileno())
+        with self.lock, self._file_lock():
+            try: changed = os.path.getsize(path) != size
+            except FileNotFoundError: changed = True # Bu arada silinmiş (ya da başka süreç arşivlemiş)
+            if changed: os.remove(tmp); return None # Geç gelen yazım; sonraki tur
+            os.replace(tmp, archive); os.remove(path)
+            if os.path.exists(self.index_path(day)): os.remove(self.index_path(day)) # Eski sürümden kalmış olabilir
+            self._bump_generation() # Atılan tekrarlar sayımları değiştirir; tüm süreçler önbelleklerini yeniler
+        metrics.inc("signal_days_archived_total"); metrics.inc("signals_compacted_total", dropped)
+        print(f"🗜️ Sinyal günü arşivlendi ({day}): {kept} satır, {dropped} tekrar atıldı")
+        return kept, dropped
+
+    def archive_old_days(self, today=None):
+        """ Bugünden önceki tüm aktif gün dosyalarını arşivler; SIGNAL_ARCHIVE_RETENTION_DAYS'ten eski arşivleri siler """
+        today = today or date.today().isoformat(); archived = []
+        with self.archive_lock:
+            with self.lock: self._migrate_legacy_log()
+            for day in sorted(self._day_of(p) for p in glob.glob(f"{glob.escape(self.root)}-????-??-??{self.ext}")):
+                if day < today and self.compact_day(day) is not None: archived.append(day)
+            if SIGNAL_ARCHIVE_RETENTION_DAYS > 0:
+                cutoff = (date.fromisoformat(today) - timedelta(days=SIGNAL_ARCHIVE_RETENTION_DAYS)).isoformat()
+                expired = [path for path in self.archive_files() if self._day_of(path) < cutoff]
+                if expired:
+                    with self.lock, self._file_lock():
+                        for path in expired:
+                            try: os.remove(path); print(f"🧹 Süresi dolan sinyal arşivi silindi: {os.path.basename(path)}")
+                            except FileNotFoundError: pass # Başka süreç silmiş
+                        self._bump_generation()
+        return archived
+
+    def partition_files(self):
+        """ Diskteki gün dosyaları (eski sürümlerden kalan .idx dosyaları dahil) """
+        return glob.glob(f"{glob.escape(self.root)}-????-??-??{self.ext}") + glob.glob(f"{glob.escape(self.root)}-????-??-??.idx")
+
+    def disk_usage(self):
+        """ (dosya sayısı, toplam bayt); arşivler dahil """
+        files = 0; total = 0
+        for path in self.partition_files() + self.archive_files():
+            try: total += os.path.getsize(path); files += 1
+            except OSError: pass # Bu arada silinmiş olabilir
+        return files, total
+
+    def clear(self, include_archives=False):
+        """ Aktif sinyal kayıtlarını (gün dosyaları) siler. Arşivleme açıksa geçmiş günler önce arşivlenir;
+        arşivler (geçmiş) yalnızca include_archives ile silinir. """
+        with self.archive_lock:
+            if SIGNAL_ARCHIVE_INTERVAL > 0 and not include_archives: self.archive_old_days()
+            with self.lock, self._file_lock(): # Başka süreçlerin yazımı bitmeden dosyalar silinmez
+                for path in self.partition_files() + (self.archive_files() if include_archives else []) + [self.base_path]: # Taşınmamış eski tek dosya da silinir
+                    try: os.remove(path)
+                    except FileNotFoundError: pass
+                self._bump_generation(); self.legacy_checked = True
+
+def _archive_maintenance_loop(store):
+    """ Geçmiş günleri periyodik olarak arşivler (ilk tur hemen: önceki çalışmalardan kalan günler) """
+    while True:
+        try: store.archive_old_days()
+        except Exception as e: print(f"❌ Sinyal arşivleme hatası: {e}\n{traceback.format_exc()}")
+        if store.maintenance_stop.wait(SIGNAL_ARCHIVE_INTERVAL): return
+
+class _RepeatFilter:
+    """ Arşivlemede tekrar ayıklama: aynı sinyal (sembol+borsa+metin) window sn içinde yeniden geldiyse tekrar sayılır """
+    def __init__(self, window):
+        self.window = window; self.last_seen = {} # (sembol, borsa, sinyal) -> son zaman damgası (sn)
+
+    def is_repeat(self, data):
+        if self.window <= 0: return False
+        try:
+            key = (data.get("symbol"), data.get("exchange"), data.get("signal"))
+            ts = datetime.fromisoformat(str(data.get("server_timestamp"))).timestamp()
+        except (ValueError, TypeError, AttributeError): return False # Eksik alanlı satırlar olduğu gibi tutulur
+        previous = self.last_seen.get(key); self.last_seen[key] = ts
+        return previous is not None and 0 <= ts - previous <= self.window
+
+class SqliteSignalStore:
+    """ SQLite (WAL) üzerinde sinyal kaydı; aynı makinedeki birden çok süreç aynı veritabanına yazar ve /ozet okur.
+    Her sinyal signals tablosuna, /ozet sayımları summary_counts tablosuna aynı işlemde yazılır; kategoriler (gün, kategori) indeksinden okunur.
+    Arşivleme günü tekrarlardan ayıklayıp archived_days'e işler (clear arşivlenmiş günleri korur). SignalStore ile aynı arayüz.
+    İlk açılışta mevcut gün dosyaları, gzip arşivleri ve eski signals.json bir kez içe aktarılır. Gün dosyaları ve arşivler yedek olarak
+    yerinde bırakılır; eski tek dosya, dosya tabanlı kayıttaki gibi signals.json.migrated olarak yeniden adlandırılır. """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS signals (id INTEGER PRIMARY KEY, day TEXT NOT NULL, exchange TEXT NOT NULL,
+                                            category TEXT, entry TEXT, payload TEXT NOT NULL);
+        CREATE INDEX IF NOT EXISTS signals_day_exchange ON signals (day, exchange);
+        CREATE INDEX IF NOT EXISTS signals_day_category ON signals (day, category) WHERE category IS NOT NULL;
+        CREATE TABLE IF NOT EXISTS summary_counts (day TEXT NOT NULL, key TEXT NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (day, key)) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS archived_days (day TEXT PRIMARY KEY) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID;
+    """
+    def __init__(self, db_path, legacy_base_path):
+        self.db_path = db_path; self.legacy_base_path = legacy_base_path
+        self.local = threading.local(); self.connections = []; self.setup_lock = threading.Lock(); self.ready = False
+        self.synchronous = "FULL" if SIGNAL_LOG_FSYNC == "batch" else "NORMAL" # WAL'da NORMAL bozulmaya karşı güvenli (yalnızca son işlemler kaybolabilir); OFF değil
+        self.maintenance = None; self.maintenance_stop = threading.Event(); self.archive_lock = threading.RLock()
+
+    def _conn(self):
+        """ Thread başına bağlantı (autocommit; işlemler _transaction ile açılır) """
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = sqlite3.connect(self.db_path, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL"); conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            with self.setup_lock: self.connections.append(conn)
+        if not self.ready: self._setup(conn)
+        return conn
+
+    @contextlib.contextmanager
+    def _transaction(self, mode="IMMEDIATE"):
+        """ IMMEDIATE: yazma kilidi baştan alınır (süreçler sırayla yazar). DEFERRED: okuma anlık görüntüsü (sayım ve kategoriler tutarlı). """
+        conn = self._conn(); conn.execute(f"BEGIN {mode}")
+        try: yield conn
+        except BaseException: conn.execute("ROLLBACK"); raise
+        conn.execute("COMMIT")
+
+    def _setup(self, conn):
+        """ Şemayı kurar ve dosya tabanlı kaydı (bir kez, tek süreç) içe aktarır """
+        with self.setup_lock:
+            if self.ready: return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for statement in filter(str.strip, self.SCHEMA.split(";")): conn.execute(statement)
+                legacy_imported = conn.execute("SELECT 1 FROM meta WHERE key = 'files_imported'").fetchone() is None and self._import_files(conn)
+            except BaseException: conn.execute("ROLLBACK"); raise
+            conn.execute("COMMIT"); self.ready = True
+            if legacy_imported: os.replace(self.legacy_base_path, self.legacy_base_path + ".migrated") # İşlem kalıcı olduktan sonra
+
+    def _import_files(self, conn):
+        """ Dosya tabanlı kayıttaki (gün dosyaları, arşivler, eski tek dosya) sinyalleri veritabanına aktarır; eski tek dosya aktarıldıysa True """
+        files = SignalStore(self.legacy_base_path); archives = files.archive_files()
+        days = sorted({files._day_of(p) for p in files.partition_files() + archives}); imported = 0
+        sources = [(day, files._iter_day_lines(day)) for day in days]
+        if os.path.exists(self.legacy_base_path): sources.append((None, open(self.legacy_base_path, "rb")))
+        for day, lines in sources:
+            rows = []
+            for line in lines:
+                if not line.strip(): continue
+                try: data = json.loads(line)
+                except Exception: continue
+                rows.append(self._row(data, line.decode("utf-8").rstrip("\n"), day))
+            if hasattr(lines, "close"): lines.close()
+            self._insert(conn, rows); imported += len(rows)
+        conn.executemany("INSERT OR IGNORE INTO archived_days VALUES (?)", [(files._day_of(p),) for p in archives])
+        conn.execute("INSERT INTO meta VALUES ('files_imported', ?)", (datetime.now().isoformat(),))
+        if imported: print(f"📦 Sinyal kaydı SQLite'a aktarıldı: {imported} satır, {len(days)} gün")
+        return len(sources) > len(days)
+
+    def _row(self, data, payload, day=None):
+        exchange = str(data.get("exchange", "")).upper(); category, entry = classify_signal(data) or (None, None)
+        day = day or str(data.get("server_timestamp", ""))[:10] or date.today().isoformat()
+        return day, exchange, category, entry, payload
+
+    @staticmethod
+    def _insert(conn, rows):
+        conn.executemany("INSERT INTO signals (day, exchange, category, entry, payload) VALUES (?, ?, ?, ?, ?)", rows)
+        counts = {}
+        for day, exchange, *_ in rows:
+            for key in summary_keys_for(exchange): counts[(day, key)] = counts.get((day, key), 0) + 1
+        conn.executemany("INSERT INTO summary_counts VALUES (?, ?, ?) ON CONFLICT (day, key) DO UPDATE SET count = count + excluded.count",
+                         [(day, key, n) for (day, key), n in counts.items()])
+
+    def append(self, data_dict):
+        """ Tek sinyali kaydeder """
+        self.append_many([data_dict])
+
+    def append_many(self, data_dicts):
+        """ Sinyalleri özet sayımlarıyla birlikte tek işlemde yazar """
+        rows = []
+        for data_dict in data_dicts:
+            data_dict['server_timestamp'] = datetime.now().isoformat()
+            rows.append(self._row(data_dict, json.dumps(data_dict, ensure_ascii=False)))
+        if not rows: return
+        if self.maintenance is None and SIGNAL_ARCHIVE_INTERVAL > 0:
+            with self.setup_lock:
+                if self.maintenance is None:
+                    self.maintenance = threading.Thread(target=_archive_maintenance_loop, args=(self,), name="signal-log-archiver", daemon=True); self.maintenance.start()
+        with self._transaction() as conn: self._insert(conn, rows)
+
+    @staticmethod
+    def _exchange_clause(exchange_filter):
+        """ /ozet filtresi: "BIST" tüm BIST* borsaları, diğerleri birebir borsa adı """
+        if exchange_filter == "BIST": return " AND exchange LIKE 'BIST%'", ()
+        return (" AND exchange = ?", (exchange_filter,)) if exchange_filter else ("", ())
+
+    def summary(self, day, exchange_filter=None):
+        """ Günün özeti: (sinyal sayısı, {kategori: [satır, ...]}). Filtre: "BIST" tüm BIST* borsaları, diğerleri birebir borsa adı. """
+        clause, params = self._exchange_clause(exchange_filter)
+        query = "SELECT category, entry FROM signals WHERE day = ? AND category IS NOT NULL" + clause; params = (day, *params)
+        with self._transaction("DEFERRED") as conn:
+            row = conn.execute("SELECT count FROM summary_counts WHERE day = ? AND key = ?", (day, exchange_filter or "*")).fetchone()
+            if not row: return 0, {}
+            categories = {}
+            for category, entry in conn.execute(query + " ORDER BY id", params): categories.setdefault(category, []).append(entry)
+        return row[0], categories
+
+    def count(self, day, exchange_filter=None):
+        """ Günün (filtreye uyan) sinyal sayısı; /ozet sayımlarından okunur """
+        row = self._conn().execute("SELECT count FROM summary_counts WHERE day = ? AND key = ?", (day, exchange_filter or "*")).fetchone()
+        return row[0] if row else 0
+
+    def signals_for_day(self, day, exchange_filter=None):
+        """ Günün sinyallerini ekleniş sırasıyla döndürür. Filtre /ozet ile aynı: "BIST" tüm BIST* borsaları, diğerleri birebir borsa adı. """
+        clause, params = self._exchange_clause(exchange_filter)
+        return [json.loads(payload) for (payload,) in self._conn().execute(f"SELECT payload FROM signals WHERE day = ?{clause} ORDER BY id", (day, *params))]
+
+    def has_day(self, day): return self._conn().execute("SELECT 1 FROM signals WHERE day = ? LIMIT 1", (day,)).fetchone() is not None
+
+    def compact_day(self, day):
+        """ Günün tekrarlarını siler, sayımları düzeltir ve günü arşivlenmiş işaretler. (tutulan, atılan) ya da arşivliyse None döndürür. """
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM archived_days WHERE day = ?", (day,)).fetchone(): return None # Başka süreç arşivlemiş
+            repeats = _RepeatFilter(SIGNAL_ARCHIVE_DEDUP_WINDOW); kept = 0; dropped = []; counts = {}
+            for row_id, exchange, payload in conn.execute("SELECT id, exchange, payload FROM signals WHERE day = ? ORDER BY id", (day,)).fetchall():
+                try: data = json.loads(payload)
+                except ValueError: data = None
+                if data is None or not repeats.is_repeat(data): kept += 1; continue
+                dropped.append((row_id,))
+                for key in summary_keys_for(exchange): counts[key] = counts.get(key, 0) + 1
+            conn.executemany("DELETE FROM signals WHERE id = ?", dropped)
+            conn.executemany("UPDATE summary_counts SET count = count - ? WHERE day = ? AND key = ?", [(n, day, key) for key, n in counts.items()])
+            conn.execute("DELETE FROM summary_counts WHERE day = ? AND count <= 0", (day,)); conn.execute("INSERT INTO archived_days VALUES (?)", (day,))
+        metrics.inc("signal_days_archived_total"); metrics.inc("signals_compacted_total", len(dropped))
+        print(f"🗜️ Sinyal günü arşivlendi ({day}): {kept} satır, {len(dropped)} tekrar atıldı")
+        return kept, len(dropped)
+
+    def archive_old_days(self, today=None):
+        """ Bugünden önceki arşivlenmemiş günleri ayıklar; SIGNAL_ARCHIVE_RETENTION_DAYS'ten eski günleri siler """
+        today = today or date.today().isoformat(); archived = []
+        with self.archive_lock:
+            days = [d for (d,) in self._conn().execute("SELECT DISTINCT day FROM signals WHERE day < ? AND day NOT IN (SELECT day FROM archived_days) ORDER BY day", (today,))]
+            for day in days:
+                if self.compact_day(day) is not None: archived.append(day)
+            if SIGNAL_ARCHIVE_RETENTION_DAYS > 0:
+                cutoff = (date.fromisoformat(today) - timedelta(days=SIGNAL_ARCHIVE_RETENTION_DAYS)).isoformat()
+                with self._transaction() as conn:
+                    removed = conn.execute("DELETE FROM signals WHERE day < ?", (cutoff,)).rowcount
+                    conn.execute("DELETE FROM summary_counts WHERE day < ?", (cutoff,)); conn.execute("DELETE FROM archived_days WHERE day < ?", (cutoff,))
+                if removed: print(f"🧹 Süresi dolan sinyaller silindi: {removed} satır ({cutoff} öncesi)")
+        return archived
+
+    def disk_usage(self):
+        """ (dosya sayısı, toplam bayt); WAL dahil """
+        files = 0; total = 0
+        for path in (self.db_path, self.db_path + "-wal", self.db_path + "-shm"):
+            try: total += os.path.getsize(path); files += 1
+            except OSError: pass
+        return files, total
+
+    def clear(self, include_archives=False):
+        """ Arşivlenmemiş günlerin sinyallerini siler. Arşivleme açıksa geçmiş günler önce arşivlenir; arşivlenmiş günler yalnızca include_archives ile silinir. """
+        with self.archive_lock:
+            if SIGNAL_ARCHIVE_INTERVAL > 0 and not include_archives: self.archive_old_days()
+            keep = "" if include_archives else " WHERE day NOT IN (SELECT day FROM archived_days)"
+            with self._transaction() as conn:
+                conn.execute("DELETE FROM signals" + keep); conn.execute("DELETE FROM summary_counts" + keep)
+                if include_archives: conn.execute("DELETE FROM archived_days")
+
+    def close(self, timeout=10.0):
+        """ Arşivleyiciyi durdurup bağlantıları kapatır """
+        self.maintenance_stop.set()
+        if self.maintenance is not None: self.maintenance.join(timeout)
+        with self.setup_lock:
+            for conn in self.connections: conn.close()
+            self.connections.clear()
+        self.local = threading.local()
+
+def create_signal_store():
+    """ STATE_BACKEND'e göre sinyal kaydı: local (gün dosyaları) ya da sqlite """
+    if STATE_BACKEND == "sqlite":
+        if sqlite3 is None: raise RuntimeError("STATE_BACKEND=sqlite için Python sqlite3 modülü gerekli")
+        return SqliteSignalStore(SIGNAL_DB_PATH or os.path.splitext(SIGNAL_LOG_FILE)[0] + ".db", SIGNAL_LOG_FILE)
+    if STATE_BACKEND != "local": print(f"⚠️ Bilinmeyen STATE_BACKEND '{STATE_BACKEND}', local kullanılıyor")
+    return SignalStore(SIGNAL_LOG_FILE)
+
+signal_store = create_signal_store()
+atexit.register(signal_store.close)
+
 # --- Analiz İşleme Fonksiyonları ---
 # GÜNCELLENDİ: keys_to_extract içinde "Potansiyel" düzeltildi
 def format_analiz_output(ticker_data):
@@ -128,23 +1471,67 @@ def format_analiz_output(ticker_data):
     output = (f"📊 *{t} Analiz Sonuçları (Puan: {puan})*\n{detay_text}\n{target_price_line}\n{potential_line}\n{analyst_count_line}\n{sector_line}\n{industry_line}\n\n{t} için analiz tamamlandı. Toplam puan: {puan}.")
     return output
 
-def format_bist_puanlama_output(ticker_data): # (Değişiklik Yok)
+BIST_EMOJI_MAP = {"peg oranı": "🎯", "f/k oranı": "💰", "net borç/favök": "🏦", "pd/dd oranı": "⚖️", "net dönem karı": "📈", "satışlar": "🛒", "favök": "🔥", "özkaynak artışı": "🧱", "varlıklar": "🏛️", "dönen varlıklar": "🔄", "duran varlıklar": "🏢", "toplam varlıklar": "🏛️", "finansal borç": "📉", "net borç": "💸", "özkaynak karlılığı": "📊", "aktif karlılık": "✅", "takipteki alacaklar": "📉", "npl oranı": "📉", "car oranı": "🛡️", "nim oranı": "🏦", "kredi artışı": "💳", "mevduat artışı": "💰", "prim üretimi": "📄", "teknik denge": "⚙️", "bileşik rasyo": "📉", "esas faaliyet karı": "💼", "finansal yük.": "📉", "veri eksik": "❓", "default": "➡️"}
+
+class KeywordEmojiMatcher:
+    """ Yorum -> emoji eşleyici. Önce yorumun başladığı en uzun anahtar (trie), yoksa yorumda geçen ve sözlükte ilk sırada olan anahtar (Aho-Corasick).
+    Tek bir trie iki iş için de kullanılır; her yorum için tek geçiş yapılır. """
+    def __init__(self, emoji_map):
+        self.default = emoji_map.get("default", "")
+        self.emojis = []; self.children = [{}]; self.terminal = [-1]; self.fail = [0]; self.best = [-1]
+        for k, v in emoji_map.items():
+            if k == "default": continue
+            node = 0
+            for ch in k:
+                nxt = self.children[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.children); self.children[node][ch] = nxt
+                    self.children.append({}); self.terminal.append(-1); self.fail.append(0); self.best.append(-1)
+                node = nxt
+            if self.terminal[node] == -1: self.terminal[node] = len(self.emojis)
+            self.emojis.append(v)
+        # Aho-Corasick hata bağlantıları (BFS) ve bunlardan türetilen tam geçiş tablosu (delta): tarama sırasında geri dönüş döngüsü olmaz.
+        # best: düğümde biten (sonek zinciri dahil) anahtarlar arasında sözlükte en önce gelenin sırası
+        self.delta = [None] * len(self.children); self.delta[0] = dict(self.children[0])
+        order = list(self.children[0].values())
+        for node in order: self.best[node] = self.terminal[node]
+        i = 0
+        while i < len(order):
+            node = order[i]; i += 1
+            self.delta[node] = dict(self.delta[self.fail[node]]); self.delta[node].update(self.children[node])
+            for ch, child in self.children[node].items():
+                self.fail[child] = self.delta[self.fail[node]].get(ch, 0)
+                candidates = [b for b in (self.terminal[child], self.best[self.fail[child]]) if b >= 0]
+                self.best[child] = min(candidates) if candidates else -1
+                order.append(child)
+
+    def match(self, text):
+        """ Küçük harfe çevrilmiş yorum için emoji """
+        children = self.children; terminal = self.terminal; node = 0; longest = -1
+        for ch in text: # En uzun önek
+            node = children[node].get(ch)
+            if node is None: break
+            if terminal[node] >= 0: longest = terminal[node]
+        if longest >= 0: return self.emojis[longest]
+        delta = self.delta; best = self.best; node = 0; found = len(self.emojis)
+        for ch in text: # Metinde geçen anahtarlar arasından sözlükte ilk sıradaki
+            node = delta[node].get(ch, 0); b = best[node]
+            if 0 <= b < found:
+                found = b
+                if not found: break
+        return self.emojis[found] if found < len(self.emojis) else self.default
+
+BIST_EMOJI_MATCHER = KeywordEmojiMatcher(BIST_EMOJI_MAP)
+
+def format_bist_puanlama_output(ticker_data):
     sembol = ticker_data.get("symbol", "?"); tip = ticker_data.get("tip", "?"); puan = ticker_data.get("score", "N/A"); sinif = ticker_data.get("classification", "?"); yorumlar = ticker_data.get("comments", []); detaylar = ticker_data.get("details", {}); analyst_summary = ticker_data.get("analyst_summary")
-    emoji_map = {"peg oranı": "🎯", "f/k oranı": "💰", "net borç/favök": "🏦", "pd/dd oranı": "⚖️", "net dönem karı": "📈", "satışlar": "🛒", "favök": "🔥", "özkaynak artışı": "🧱", "varlıklar": "🏛️", "dönen varlıklar": "🔄", "duran varlıklar": "🏢", "toplam varlıklar": "🏛️", "finansal borç": "📉", "net borç": "💸", "özkaynak karlılığı": "📊", "aktif karlılık": "✅", "takipteki alacaklar": "📉", "npl oranı": "📉", "car oranı": "🛡️", "nim oranı": "🏦", "kredi artışı": "💳", "mevduat artışı": "💰", "prim üretimi": "📄", "teknik denge": "⚙️", "bileşik rasyo": "📉", "esas faaliyet karı": "💼", "finansal yük.": "📉", "veri eksik": "❓", "default": "➡️"}
     output_lines = [f"📊 *{sembol}* ({tip}) - Puanlama Analizi\n", f"📈 Puan: *{puan}* | 🏅 Sınıf: {sinif}\n"]
     if yorumlar:
         output_lines.append("📝 *Yorumlar:*")
         for y in yorumlar:
             y_clean = str(y).strip();
             if not y_clean: continue
-            eklenecek_emoji = emoji_map["default"]; lower_y = y_clean.lower(); found_emoji = False; best_match_key = ""
-            for k in emoji_map.keys():
-                if k != "default" and lower_y.startswith(k):
-                    if len(k) > len(best_match_key): best_match_key = k
-            if best_match_key: eklenecek_emoji = emoji_map[best_match_key]; found_emoji = True
-            if not found_emoji:
-                 for k, v in emoji_map.items():
-                     if k != "default" and k in lower_y: eklenecek_emoji = v; break
+            eklenecek_emoji = BIST_EMOJI_MATCHER.match(y_clean.lower())
             output_lines.append(f"  {eklenecek_emoji} {y_clean}")
         output_lines.append("")
     else: output_lines.append("📝 Yorumlar: (Bulunamadı)\n")
@@ -153,26 +1540,104 @@ def format_bist_puanlama_output(ticker_data): # (Değişiklik Yok)
     if analyst_summary: output_lines.append("👨‍💼 *Analist Özeti:*"); output_lines.append(f"  {analyst_summary}")
     return "\n".join(output_lines).strip()
 
+# --- Sütunlu Analiz Görünümü ---
+_METRIC_LINE_RE = re.compile(r"\*([^*()]+?)\s*\(\s*([-+]?\d+(?:[.,]\d+)?)\s*\)\*")
+_SCREEN_CONDITION_RE = re.compile(r"([A-Za-zÇĞİÖŞÜçğıöşü][\w/.\-]*)\s*(<=|>=|<|>|=)\s*([-+]?\d+(?:[.,]\d+)?)")
+_SCREEN_ALIASES = {"PE": "P/E", "FK": "P/E", "FPE": "Forward P/E", "FORWARDPE": "Forward P/E", "PEG": "PEG", "ROE": "ROE", "PM": "Profit Margin", "MARGIN": "Profit Margin", "PROFITMARGIN": "Profit Margin", "DE": "Debt/Eq", "DEBT": "Debt/Eq", "DEBTEQ": "Debt/Eq", "QR": "Quick Ratio", "QUICK": "Quick Ratio", "QUICKRATIO": "Quick Ratio", "EPS": "EPS this Y", "EPSTHISY": "EPS this Y", "EPSNEXT": "EPS next Y", "EPSNEXTY": "EPS next Y"}
+_SCREEN_OPS = {"<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal, "=": np.equal}
+
+def _to_number(value):
+    """ Puan/metrik değerini float'a çevirir; sayı değilse NaN """
+    if isinstance(value, bool): return float("nan")
+    if isinstance(value, (int, float)): return float(value)
+    try: return float(str(value).strip().replace(',', '.'))
+    except (TypeError, ValueError): return float("nan")
+
+def _metric_key(name): return re.sub(r"[\s/_.\-]", "", str(name)).upper()
+
+def _top_indices(values, n, mask=None):
+    """ values'un en büyük n elemanının sırası (büyükten küçüğe); NaN'lar ve mask dışı elemanlar atlanır. Kısmi sıralama (argpartition). """
+    valid = ~np.isnan(values)
+    if mask is not None: valid &= mask
+    idx = np.flatnonzero(valid)
+    if n < len(idx): idx = idx[np.argpartition(-values[idx], n - 1)[:n]]
+    return idx[np.lexsort((idx, -values[idx]))] # Eşit puanlarda dosyadaki sıra korunur
+
+class AnalizColumns:
+    """ analiz.json'un sütunlu görünümü: sembol dizini, puan ve detay satırlarından bir kez ayrıştırılan metrikler (P/E, PEG, ROE, ...). Eksik değer NaN. """
+    def __init__(self, data):
+        items = [(k, v) for k, v in data.items() if isinstance(v, dict)]; n = len(items)
+        self.symbols = [k for k, _ in items]; self.index = {k: i for i, k in enumerate(self.symbols)}
+        self.score = np.array([_to_number(v.get("puan")) for _, v in items], dtype=np.float64)
+        self.metrics = {} # metrik adı -> float64 dizi
+        for i, (_, v) in enumerate(items):
+            for line in v.get("detaylar", []) or []:
+                m = _METRIC_LINE_RE.search(str(line))
+                if not m: continue
+                column = self.metrics.get(m.group(1).strip())
+                if column is None: column = self.metrics[m.group(1).strip()] = np.full(n, np.nan)
+                column[i] = _to_number(m.group(2))
+        self.metric_keys = {_metric_key(name): name for name in self.metrics}
+
+    def score_of(self, symbol):
+        i = self.index.get(symbol)
+        return -float("inf") if i is None or np.isnan(self.score[i]) else float(self.score[i])
+
+    def resolve_metric(self, name):
+        """ Kullanıcının yazdığı metrik adını (PE, ROE, Debt/Eq, PUAN ...) sütun adına çevirir; bilinmiyorsa None """
+        key = _metric_key(name)
+        if key in ("PUAN", "SCORE"): return "puan"
+        if key in self.metric_keys: return self.metric_keys[key]
+        alias = _SCREEN_ALIASES.get(key)
+        return alias if alias in self.metrics else None
+
+    def column(self, name): return self.score if name == "puan" else self.metrics[name]
+
+    def top(self, n): return [self.symbols[i] for i in _top_indices(self.score, n)]
+
+    def screen(self, conditions, limit):
+        """ conditions: [(sütun, operatör, değer)]. (eşleşen sayısı, puana göre ilk `limit` sembol) döndürür """
+        mask = np.ones(len(self.symbols), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            for name, op, value in conditions: mask &= _SCREEN_OPS[op](self.column(name), value)
+        scores = np.where(np.isnan(self.score), -np.inf, self.score) # Puansız hisseler de listelenir (en sonda)
+        return int(mask.sum()), [self.symbols[i] for i in _top_indices(scores, limit, mask)]
+
+class BistColumns:
+    """ analiz_sonuclari.json'un sütunlu görünümü: sembol, score, tip ve sınıf """
+    def __init__(self, data):
+        items = [(k, v) for k, v in data.items() if isinstance(v, dict)]
+        self.symbols = [k for k, _ in items]
+        self.score = np.array([_to_number(v.get("score")) for _, v in items], dtype=np.float64)
+        self.tip = np.array([str(v.get("tip", "")).strip().lower() for _, v in items], dtype=object)
+        self.tips = [str(v.get("tip", "?")) for _, v in items]; self.classification = [str(v.get("classification", "?")) for _, v in items]
+
+    def top(self, n, tip=None):
+        """ En yüksek puanlı n hissenin sırası (tip verilirse sadece o tip) """
+        mask = (self.tip == tip.strip().lower()) if tip else None
+        return list(_top_indices(self.score, n, mask))
+
 # --- Komut İşleyiciler ---
-def handle_analiz_command(chat_id, args): # (Değişiklik Yok)
+def handle_analiz_command(chat_id, args):
     if not args: send_telegram_message(chat_id, "Lütfen analiz için sembolleri belirtin.\nÖrnek: `/analiz AAPL, MSFT`"); return
     tickers = [t.strip().upper() for t in re.split(r'[ ,]+', args) if t.strip()]
     if not tickers: send_telegram_message(chat_id, "Geçerli sembol belirtilmedi.\nÖrnek: `/analiz AAPL,MSFT`"); return
     print(f"🔍 /analiz komutu alındı (Chat ID: {chat_id}): {tickers}")
-    data = load_json_file(ANALIZ_FILE)
+    data, data_version = analiz_cache.get_snapshot()
     if data is None: send_telegram_message(chat_id, f"❌ Analiz verisi ({os.path.basename(ANALIZ_FILE)}) yüklenemedi."); return
     if not data: send_telegram_message(chat_id, f"❌ Analiz verisi ({os.path.basename(ANALIZ_FILE)}) bulunamadı/boş."); return
     results_found, results_not_found = [], []
     for t in tickers:
         hisse_data = data.get(t)
-        if hisse_data and isinstance(hisse_data, dict): hisse_data['symbol'] = t; results_found.append(hisse_data)
+        if hisse_data and isinstance(hisse_data, dict): results_found.append(dict(hisse_data, symbol=t)) # Önbellekteki veri değiştirilmez
         else: results_not_found.append(f"❌ `{t}` için veri bulunamadı.")
     if not results_found:
         error_message = "\n".join(results_not_found) if results_not_found else f"❌ Sembol(ler) için ({', '.join(tickers)}) veri bulunamadı."
         send_telegram_message(chat_id, error_message); return
-    def get_score(item): score = item.get('puan', -float('inf')); return score if isinstance(score, (int, float)) else float(score) if isinstance(score, str) and score.replace('.','',1).isdigit() else -float('inf')
-    results_found.sort(key=get_score, reverse=True)
-    formatted_results = [format_analiz_output(hisse) for hisse in results_found]
+    columns = analiz_cache.get_view("columns") # Puanlar yüklemede bir kez sayıya çevrildi
+    results_found.sort(key=lambda hisse: columns.score_of(hisse['symbol']), reverse=True)
+    # Aynı veri sürümünde aynı sembolün mesajı bir kez hazırlanır
+    formatted_results = [analiz_render_cache.get_or_render(hisse['symbol'], data_version, lambda hisse=hisse: format_analiz_output(hisse)) for hisse in results_found]
     final_output = "\n\n".join(formatted_results + results_not_found)
     send_telegram_message(chat_id, final_output)
 
@@ -191,8 +1656,8 @@ def handle_bist_analiz_command(chat_id, args):
 
     print(f"🔍 /bist_analiz komutu alındı (Chat ID: {chat_id}): {tickers}")
 
-    # analiz_sonuclari.json dosyasını oku
-    data = load_json_file(BIST_ANALIZ_FILE)
+    # analiz_sonuclari.json verisini önbellekten al (dosya değiştiyse yeniden yüklenir)
+    data, data_version = bist_analiz_cache.get_snapshot()
     if data is None:
         send_telegram_message(chat_id, f"❌ BİST Puanlama verisi ({os.path.basename(BIST_ANALIZ_FILE)}) yüklenemedi.")
         return
@@ -206,7 +1671,7 @@ def handle_bist_analiz_command(chat_id, args):
     for t in tickers:
         hisse_data = data.get(t)
         if hisse_data and isinstance(hisse_data, dict):
-            results_found.append(hisse_data) # Veri bulunduysa listeye ekle
+            results_found.append((t, hisse_data)) # Veri bulunduysa listeye ekle
         else:
             results_not_found.append(f"❌ `{t}` için BİST puanlama verisi bulunamadı.")
 
@@ -220,7 +1685,7 @@ def handle_bist_analiz_command(chat_id, args):
     # def get_bist_score(item): score = item.get('score', -float('inf')); return score if isinstance(score, (int, float)) else float(score) if isinstance(score, str) and score.replace('.','',1).isdigit() else -float('inf')
     # results_found.sort(key=get_bist_score, reverse=True)
 
-    formatted_results = [format_bist_puanlama_output(hisse) for hisse in results_found]
+    formatted_results = [bist_render_cache.get_or_render(t, data_version, lambda hisse=hisse: format_bist_puanlama_output(hisse)) for t, hisse in results_found]
 
     # Tüm mesajları birleştir (bulunanlar + bulunamayanlar)
     final_output_parts = formatted_results + results_not_found
@@ -229,78 +1694,116 @@ def handle_bist_analiz_command(chat_id, args):
     # Tek mesaj olarak gönder
     send_telegram_message(chat_id, final_output)
 
-def handle_ozet_command(chat_id, args): # (Değişiklik Yok)
-    target_exchange_filter = args.strip().upper() if args.strip() else None
-    print(f"🔍 /ozet komutu alındı (Chat ID: {chat_id}) - Filtre: {target_exchange_filter}")
-    today_str = date.today().isoformat()
-    signals_today = []
+def _parse_top_count(text):
+    try: return max(1, min(int(text), SCREEN_RESULT_LIMIT))
+    except (TypeError, ValueError): return None
+
+def handle_top_command(chat_id, args):
+    """ /top [N]: analiz.json'daki en yüksek puanlı N hisse """
+    n = _parse_top_count(args.strip()) if args.strip() else 10
+    if n is None: send_telegram_message(chat_id, "Geçerli bir sayı belirtin.\nÖrnek: `/top 10`"); return
+    print(f"🔍 /top komutu alındı (Chat ID: {chat_id}): {n}")
+    data = analiz_cache.get()
+    if not data: send_telegram_message(chat_id, f"❌ Analiz verisi ({os.path.basename(ANALIZ_FILE)}) yüklenemedi/boş."); return
+    columns = analiz_cache.get_view("columns"); symbols = columns.top(n)
+    if not symbols: send_telegram_message(chat_id, "❌ Puanı olan hisse bulunamadı."); return
+    lines = [f"🏆 *En Yüksek Puanlı {len(symbols)} Hisse* ({len(columns.symbols)} içinden)\n"]
+    lines += [f"{i}. `{sym}` — Puan: {columns.score_of(sym):g}" for i, sym in enumerate(symbols, 1)]
+    send_telegram_message(chat_id, "\n".join(lines))
+
+def handle_screen_command(chat_id, args):
+    """ /screen PE<20 ROE>15 ...: koşulların hepsini sağlayan hisseler (puana göre) """
+    usage = "Örnek: `/screen PE<20 ROE>15`\nMetrikler: PE, FPE, PEG, ROE, PM, DE, QR, EPS, EPSNEXT, PUAN"
+    matches = list(_SCREEN_CONDITION_RE.finditer(args))
+    leftover = _SCREEN_CONDITION_RE.sub("", args).replace(",", " ").strip()
+    if not matches or leftover: send_telegram_message(chat_id, f"Geçerli tarama koşulu belirtilmedi.\n{usage}"); return
+    print(f"🔍 /screen komutu alındı (Chat ID: {chat_id}): {args}")
+    data = analiz_cache.get()
+    if not data: send_telegram_message(chat_id, f"❌ Analiz verisi ({os.path.basename(ANALIZ_FILE)}) yüklenemedi/boş."); return
+    columns = analiz_cache.get_view("columns"); conditions = []
+    for m in matches:
+        name = columns.resolve_metric(m.group(1))
+        if name is None: send_telegram_message(chat_id, f"❓ Bilinmeyen metrik: `{m.group(1)}`\n{usage}"); return
+        conditions.append((name, m.group(2), _to_number(m.group(3))))
+    total, symbols = columns.screen(conditions, SCREEN_RESULT_LIMIT)
+    title = " ".join(f"{name}{op}{value:g}" for name, op, value in conditions)
+    if not symbols: send_telegram_message(chat_id, f"🔎 *Tarama:* {title}\n\nKoşulları sağlayan hisse bulunamadı."); return
+    shown = [name for name, _, _ in conditions if name != "puan"]
+    lines = [f"🔎 *Tarama:* {title}\n{total} hisse bulundu" + (f" (puana göre ilk {len(symbols)})" if total > len(symbols) else "") + "\n"]
+    for i, sym in enumerate(symbols, 1):
+        row = columns.index[sym]; values = [f"{name} {columns.column(name)[row]:g}" for name in shown]
+        lines.append(f"{i}. `{sym}` — Puan: {columns.score_of(sym):g}" + ("".join(f" | {v}" for v in values)))
+    send_telegram_message(chat_id, "\n".join(lines))
+
+def handle_bist_top_command(chat_id, args):
+    """ /bist_top [N] [tip]: analiz_sonuclari.json'daki en yüksek puanlı N hisse, istenirse tek tip """
+    parts = args.split(); n = 10; tip = None
+    if parts and parts[0].lstrip('-').isdigit(): n = _parse_top_count(parts[0]); parts = parts[1:]
+    if parts: tip = " ".join(parts)
+    print(f"🔍 /bist_top komutu alındı (Chat ID: {chat_id}): {n} {tip or ''}")
+    data = bist_analiz_cache.get()
+    if not data: send_telegram_message(chat_id, f"❌ BİST Puanlama verisi ({os.path.basename(BIST_ANALIZ_FILE)}) yüklenemedi/boş."); return
+    columns = bist_analiz_cache.get_view("columns"); rows = columns.top(n, tip)
+    if not rows: send_telegram_message(chat_id, f"❌ {'`' + tip + '` tipi için ' if tip else ''}puanı olan BİST hissesi bulunamadı."); return
+    lines = [f"🏆 *BİST En Yüksek Puanlı {len(rows)} Hisse*" + (f" ({tip})" if tip else "") + "\n"]
+    lines += [f"{i}. `{columns.symbols[r]}` ({columns.tips[r]}) — Puan: {columns.score[r]:g} | Sınıf: {columns.classification[r]}" for i, r in enumerate(rows, 1)]
+    send_telegram_message(chat_id, "\n".join(lines))
+
+_OZET_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+def handle_ozet_command(chat_id, args):
+    """ /ozet [Borsa] [YYYY-AA-GG]: günün (varsayılan bugün) sinyal özeti; geçmiş günler arşivden akış halinde okunur """
+    words = args.split(); dates = [w for w in words if _OZET_DATE_RE.match(w)]; rest = [w for w in words if not _OZET_DATE_RE.match(w)]
+    target_exchange_filter = " ".join(rest).upper() or None
+    today_str = date.today().isoformat(); day_str = dates[-1] if dates else today_str
+    try: valid_day = date.fromisoformat(day_str).isoformat() <= today_str
+    except ValueError: valid_day = False
+    if not valid_day: send_telegram_message(chat_id, f"❌ Geçersiz tarih: `{day_str}`\nÖrnek: `/ozet BIST 2026-10-15`"); return
+    is_today = day_str == today_str; day_label = "Bugün" if is_today else "Bu tarihte"
+    print(f"🔍 /ozet komutu alındı (Chat ID: {chat_id}) - Filtre: {target_exchange_filter} - Tarih: {day_str}")
     try:
-        if not os.path.exists(SIGNAL_LOG_FILE): send_telegram_message(chat_id, "ℹ️ Bugün için kaydedilmiş sinyal bulunamadı."); return
-        with open(SIGNAL_LOG_FILE, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip();
-                if not line: continue
-                try:
-                    signal_data = json.loads(line); signal_ts = signal_data.get('server_timestamp', '')
-                    if signal_ts.startswith(today_str):
-                        original_exchange = str(signal_data.get("exchange", "")).upper(); should_include = False
-                        if not target_exchange_filter: should_include = True
-                        elif target_exchange_filter == "BIST" and original_exchange.startswith("BIST"): should_include = True
-                        elif original_exchange == target_exchange_filter: should_include = True
-                        if should_include: signals_today.append(signal_data)
-                except Exception as e: print(f"⚠️ Satır işlenirken hata: {e} - Satır: {line[:100]}")
+        if not signal_store.has_day(day_str): send_telegram_message(chat_id, f"ℹ️ {'Bugün' if is_today else day_str} için kaydedilmiş sinyal bulunamadı."); return
+        # Bugünün özeti sinyaller geldikçe hazırlanır; geçmiş günler ilk istekte arşivden kurulur
+        signal_count, kategori_map = signal_store.summary(day_str, target_exchange_filter)
     except Exception as e:
         print(f"❌ Sinyal log dosyası ({SIGNAL_LOG_FILE}) okunurken hata: {e}"); send_telegram_message(chat_id, f"❌ Sinyal log dosyası okunurken bir hata oluştu.")
         if ADMIN_CHAT_ID: send_telegram_message(ADMIN_CHAT_ID, f"🚨 Sinyal Log Okuma Hatası!\nDosya: {SIGNAL_LOG_FILE}\nHata: {e}", parse_mode=None, avoid_self_notify=True)
         return
-    ozet_title = f"({today_str})" if not target_exchange_filter else f"({target_exchange_filter} - {today_str})"
-    if not signals_today: send_telegram_message(chat_id, f"📊 GÜNLÜK SİNYAL ÖZETİ {ozet_title}:\n\nBugün bu filtre için kaydedilmiş sinyal bulunamadı."); return
-    kategori_map = {"kairi_neg30": [], "kairi_neg20": [], "matisay_neg25": [], "mukemmel_alis": [], "alis_sayim": [], "mukemmel_satis": [], "satis_sayim": []}
-    for s in signals_today:
-        symbol = s.get("symbol", "?"); exchange_orig = s.get("exchange", "?"); exchange_simp = simplify_exchange(exchange_orig)
-        signal_text = str(s.get("signal", "")).strip(); lower_signal = signal_text.lower(); processed = False
-        if "kairi" in lower_signal and "seviyesinde" in lower_signal:
-            try:
-                kairi_match = re.search(r'([-+]?\d*[,.]?\d+)', signal_text.replace(',', '.'))
-                if kairi_match: kairi_val = float(kairi_match.group(1)); entry = f"{symbol} ({exchange_simp}): KAIRI {kairi_val:.2f}".replace('.',',');
-                if kairi_val <= -30: kategori_map["kairi_neg30"].append(entry); processed = True
-                elif kairi_val <= -20: kategori_map["kairi_neg20"].append(entry); processed = True
-            except: pass
-        if not processed and "matisay" in lower_signal and ("değerinde" in lower_signal or "kesti" in lower_signal):
-             try:
-                matisay_match = re.search(r'([-+]?\d*[,.]?\d+)', signal_text.replace(',', '.'))
-                if matisay_match: matisay_val = float(matisay_match.group(1)); entry = f"{symbol} ({exchange_simp}): Matisay {matisay_val:.2f}".replace('.',',');
-                if matisay_val < -25: kategori_map["matisay_neg25"].append(entry); processed = True
-             except: pass
-        if not processed:
-            entry = f"{symbol} ({exchange_simp}): {signal_text}"
-            if "mükemmel alış" in lower_signal: kategori_map["mukemmel_alis"].append(entry)
-            elif "alış sayımı" in lower_signal: kategori_map["alis_sayim"].append(entry)
-            elif "mükemmel satış" in lower_signal: kategori_map["mukemmel_satis"].append(entry)
-            elif "satış sayımı" in lower_signal: kategori_map["satis_sayim"].append(entry)
+    ozet_title = f"({day_str})" if not target_exchange_filter else f"({target_exchange_filter} - {day_str})"
+    if not signal_count: send_telegram_message(chat_id, f"📊 GÜNLÜK SİNYAL ÖZETİ {ozet_title}:\n\n{day_label} bu filtre için kaydedilmiş sinyal bulunamadı."); return
     ozet_mesaji = [f"📊 GÜNLÜK SİNYAL ÖZETİ {ozet_title}:\n"]; any_category_found = False
     kategori_basliklari = {"guclu": "📊 GÜÇLÜ EŞLEŞEN SİNYALLER:", "kairi_neg30": "🔴 KAIRI ≤ -30:", "kairi_neg20": "🟠 KAIRI ≤ -20 (ama > -30):", "mukemmel_alis": "🟢 Mükemmel Alış:", "alis_sayim": "📈 Alış Sayımı Tamamlananlar:", "mukemmel_satis": "🔵 Mükemmel Satış:", "satis_sayim": "📉 Satış Sayımı Tamamlananlar:", "matisay_neg25": "🟣 Matisay < -25:"}
     for key, baslik in kategori_basliklari.items():
         signals_in_category = kategori_map.get(key, [])
         if signals_in_category: any_category_found = True; ozet_mesaji.append(baslik); ozet_mesaji.extend(signals_in_category); ozet_mesaji.append("")
-    if not any_category_found: ozet_mesaji = [f"📊 GÜNLÜK SİNYAL ÖZETİ {ozet_title}:\n"]; ozet_mesaji.append("Bugün bu filtre için özetlenecek sinyal bulunamadı.")
+    if not any_category_found: ozet_mesaji = [f"📊 GÜNLÜK SİNYAL ÖZETİ {ozet_title}:\n"]; ozet_mesaji.append(f"{day_label} bu filtre için özetlenecek sinyal bulunamadı.")
     final_ozet = "\n".join(ozet_mesaji).strip()
     send_telegram_message(chat_id, final_ozet, parse_mode=None)
     
 
-# --- Flask Rotaları ---
-@app.route("/clear_signals", methods=['POST'])
-def clear_signals_log():
-    """ '/clear_signals' POST isteği aldığında sinyal log dosyasını temizler. """
+# --- İstek İşleyicileri ---
+# Rota gövdeleri çatıdan bağımsızdır: ham istek gövdesini (bytes) alır, (gövde, durum kodu) döndürür.
+# Gövde dict ise JSON olarak yazılır. Flask rotaları ve ASGI uygulaması aynı fonksiyonları çağırır.
+def _notify_endpoint_error(title, e, error_details, raw_data):
+    """ Endpoint hatasını yöneticiye bildirir (istek gövdesinin ilk 1000 karakteriyle) """
+    if not ADMIN_CHAT_ID: return
+    try: request_data = raw_data.decode('utf-8', errors='replace')
+    except Exception: request_data = "Request data could not be read."
+    error_message_to_admin = f"🚨 {title}!\n\nError: {e}\n\nTraceback:\n{error_details}\n\nRequest Data:\n{request_data[:1000]}"
+    send_telegram_message(ADMIN_CHAT_ID, error_message_to_admin, parse_mode=None, avoid_self_notify=True)
+
+def process_clear_signals(raw_data=b""):
+    """ '/clear_signals' POST isteği aldığında sinyal log dosyasını temizler. Geçmiş günler önce arşivlenir ve korunur;
+    gövde {"archives": true} ise arşivler de silinir. """
     print("🧹 /clear_signals isteği alındı...")
     try:
-        # Dosyayı 'w' (write) modunda açıp hemen kapatmak içeriğini temizler.
-        # Dosya yoksa oluşturur (boş olarak).
-        with open(SIGNAL_LOG_FILE, "w", encoding="utf-8") as f:
-            pass # Dosyayı açıp kapatmak yeterli
+        try: include_archives = bool(raw_data) and json.loads(raw_data.decode('utf-8')).get("archives") is True
+        except (ValueError, UnicodeDecodeError, AttributeError): include_archives = False
+        # Gün dosyaları ve (varsa) eski tek dosya silinir.
+        signal_store.clear(include_archives=include_archives)
         print(f"✅ Sinyal log dosyası başarıyla temizlendi: {SIGNAL_LOG_FILE}")
         # Başarı mesajını JSON olarak döndürelim (API tarzı için daha uygun)
-        return jsonify({"status": "success", "message": f"Signal log file '{os.path.basename(SIGNAL_LOG_FILE)}' cleared."}), 200
+        return {"status": "success", "message": f"Signal log file '{os.path.basename(SIGNAL_LOG_FILE)}' cleared."}, 200
     except Exception as e:
         error_details = traceback.format_exc()
         print(f"💥 Sinyal log temizleme hatası: {e}\n{error_details}")
@@ -309,13 +1812,39 @@ def clear_signals_log():
              error_message_to_admin = f"🚨 Sinyal Log Temizleme Hatası!\n\nError: {e}\n\nDosya: {SIGNAL_LOG_FILE}"
              send_telegram_message(ADMIN_CHAT_ID, error_message_to_admin, parse_mode=None, avoid_self_notify=True)
         # Hata mesajını JSON olarak döndür
-        return jsonify({"status": "error", "message": "Failed to clear signal log file."}), 500
-        
-@app.route("/telegram", methods=["POST"])
-def telegram_webhook(): # (Değişiklik Yok)
-    start_time = time.time(); update = {}
+        return {"status": "error", "message": "Failed to clear signal log file."}, 500
+
+_COMMANDS = ("/analiz", "/bist_analiz", "/ozet", "/top", "/screen", "/bist_top", "/start", "/help")
+
+def dispatch_command(chat_id, command, args, first_name=""):
+    """ Telegram komutunu ("/analiz" gibi, küçük harf) ilgili komut işleyicisine yönlendirir; süresi metriklere eklenir """
+    label = command if command in _COMMANDS else "unknown" # Etiket sayısı sınırlı kalsın
+    metrics.inc("commands_total", command=label)
+    with metrics.timer("command_duration_seconds", command=label): _run_command(chat_id, command, args, first_name)
+
+def _run_command(chat_id, command, args, first_name):
+    if command == "/analiz": handle_analiz_command(chat_id, args)
+    elif command == "/bist_analiz": handle_bist_analiz_command(chat_id, args) # Güncellenmiş halini çağırır
+    elif command == "/ozet": handle_ozet_command(chat_id, args)
+    elif command == "/top": handle_top_command(chat_id, args)
+    elif command == "/screen": handle_screen_command(chat_id, args)
+    elif command == "/bist_top": handle_bist_top_command(chat_id, args)
+    elif command == "/start" or command == "/help":
+         # YARDIM MESAJI GÜNCELLENDİ
+         help_text = (f"Merhaba {first_name}! 👋\n\nKullanılabilir komutlar:\n\n"
+             "*ABD Analizi:*\n`/analiz <Sembol1>,<Sembol2>,...`\n_(Örn: `/analiz TSLA,AAPL`)_\n\n"
+             "*BİST Puanlama Analizi:*\n`/bist_analiz <Sembol1>,<Sembol2>,...`\n_(Örn: `/bist_analiz MIATK,ASELS`)_\n\n" # Açıklama güncellendi
+             "*Günlük Özet:*\n`/ozet [Borsa] [YYYY-AA-GG]`\n_(Örn: `/ozet BINANCE`, `/ozet BIST 2026-10-15` veya `/ozet` tümü için)_\n\n"
+             "*Sıralama ve Tarama:*\n`/top [N]` - En yüksek puanlı ABD hisseleri\n`/screen <Koşullar>`\n_(Örn: `/screen PE<20 ROE>15`)_\n`/bist_top [N] [Tip]` - En yüksek puanlı BİST hisseleri\n\n"
+             "*Diğer:*\n`/help` - Bu yardım mesajı.")
+         send_telegram_message(chat_id, help_text)
+    else: send_telegram_message(chat_id, f"❓ Bilinmeyen komut: `{command}`\n/help yazın.")
+
+def process_telegram_update(raw_data):
+    update = {}
     try:
-        update = request.get_json();
+        try: update = json.loads(raw_data.decode('utf-8')) if raw_data else None
+        except (ValueError, UnicodeDecodeError): update = None
         if not update: print("⚠️ Boş veya geçersiz JSON alındı."); return "error: invalid json", 400
         if "message" in update and "text" in update["message"]:
             message = update["message"]; chat_id = message["chat"]["id"]; text = message["text"]
@@ -323,47 +1852,46 @@ def telegram_webhook(): # (Değişiklik Yok)
             if text.startswith('/'):
                 parts = text.split(' ', 1); command = parts[0].lower(); args = parts[1].strip() if len(parts) > 1 else ""
                 print(f"➡️ Komut: {command} | Args: '{args}' | Chat: {chat_id} | User: @{username} ({first_name})")
-                if command == "/analiz": handle_analiz_command(chat_id, args)
-                elif command == "/bist_analiz": handle_bist_analiz_command(chat_id, args) # Güncellenmiş halini çağırır
-                elif command == "/ozet": handle_ozet_command(chat_id, args)
-                elif command == "/start" or command == "/help":
-                     # YARDIM MESAJI GÜNCELLENDİ
-                     help_text = (f"Merhaba {first_name}! 👋\n\nKullanılabilir komutlar:\n\n"
-                         "*ABD Analizi:*\n`/analiz <Sembol1>,<Sembol2>,...`\n_(Örn: `/analiz TSLA,AAPL`)_\n\n"
-                         "*BİST Puanlama Analizi:*\n`/bist_analiz <Sembol1>,<Sembol2>,...`\n_(Örn: `/bist_analiz MIATK,ASELS`)_\n\n" # Açıklama güncellendi
-                         "*Günlük Özet:*\n`/ozet [Borsa]`\n_(Örn: `/ozet BINANCE` veya `/ozet` tümü için)_\n\n"
-                         "*Diğer:*\n`/help` - Bu yardım mesajı.")
-                     send_telegram_message(chat_id, help_text)
-                else: send_telegram_message(chat_id, f"❓ Bilinmeyen komut: `{command}`\n/help yazın.")
+                dispatch_command(chat_id, command, args, first_name)
         return "ok", 200
     except Exception as e:
         error_details = traceback.format_exc(); print(f"💥 Webhook HATA: {e}\n{error_details}")
-        if ADMIN_CHAT_ID:
-             try: request_data = request.get_data(as_text=True)
-             except Exception: request_data = "Request data could not be read."
-             error_message_to_admin = f"🚨 Webhook Hatası!\n\nError: {e}\n\nTraceback:\n{error_details}\n\nRequest Data:\n{request_data[:1000]}"
-             send_telegram_message(ADMIN_CHAT_ID, error_message_to_admin, parse_mode=None, avoid_self_notify=True)
+        _notify_endpoint_error("Webhook Hatası", e, error_details, raw_data)
         try:
              if 'message' in update and 'chat' in update['message']: user_chat_id = update['message']['chat']['id']; send_telegram_message(user_chat_id, "⚠️ Bir hata oluştu. Yönetici bilgilendirildi.")
         except Exception as inner_e: print(f"⚠️ Kullanıcıya hata mesajı gönderirken hata: {inner_e}")
         return "error", 500
-    finally:
-         end_time = time.time(); print(f"⏱️ İstek işleme süresi: {end_time - start_time:.4f} saniye")
 
-@app.route("/", methods=["GET"])
-def index(): return """<!DOCTYPE html><html><head><title>SignalCihangir Bot</title></head><body><h1>SignalCihangir Bot Aktif!</h1><p>Webhook <code>/telegram</code>, Sinyal Alıcı <code>/signal</code></p><p>Test: <a href="/test">/test</a></p></body></html>""", 200
-@app.route("/test", methods=["GET"])
-def test():
+def process_metrics(raw_data=b""): return metrics.render(), 200, "text/plain; version=0.0.4; charset=utf-8"
+
+def process_profiler(raw_data):
+    """ Örnekleyici profiler'ı çalışma anında yönetir: {"token": PROFILER_TOKEN, "action": "start"|"stop"|"report", "interval": sn}.
+    stop ve report, toplanan yığınları collapsed stack biçiminde döndürür. PROFILER_TOKEN ayarlı değilse kapalıdır. """
+    if not PROFILER_TOKEN: return "error: profiler disabled", 403
+    try: payload = json.loads(raw_data.decode('utf-8')) if raw_data else {}
+    except (ValueError, UnicodeDecodeError): return "error: invalid json", 400
+    if not isinstance(payload, dict) or payload.get("token") != PROFILER_TOKEN: return "error: forbidden", 403
+    action = payload.get("action", "report")
+    if action == "start":
+        try: interval = float(payload.get("interval", PROFILER_INTERVAL))
+        except (TypeError, ValueError): return "error: invalid interval", 400
+        return {"status": "started" if profiler.start(interval) else "already running", "interval": profiler.interval}, 200
+    if action == "stop": profiler.stop()
+    elif action != "report": return "error: unknown action", 400
+    return profiler.report(), 200, "text/plain; charset=utf-8"
+
+def process_index(raw_data=b""): return """<!DOCTYPE html><html><head><title>SignalCihangir Bot</title></head><body><h1>SignalCihangir Bot Aktif!</h1><p>Webhook <code>/telegram</code>, Sinyal Alıcı <code>/signal</code>, Toplu Sinyal <code>/signals/batch</code>, Metrikler <code>/metrics</code></p><p>Test: <a href="/test">/test</a></p></body></html>""", 200
+
+def process_test(raw_data=b""):
     message_to_admin = "✅ Bot test endpoint'i başarıyla çalıştırıldı."
     if ADMIN_CHAT_ID:
-        if send_telegram_message(ADMIN_CHAT_ID, message_to_admin): return f"Test başarılı! Yöneticiye (ID: {ADMIN_CHAT_ID}) mesaj gönderildi.", 200
+        if deliver_telegram_message(ADMIN_CHAT_ID, message_to_admin): return f"Test başarılı! Yöneticiye (ID: {ADMIN_CHAT_ID}) mesaj gönderildi.", 200
         else: return f"Test endpoint'i çalıştı ancak yöneticiye mesaj gönderilemedi (ID: {ADMIN_CHAT_ID}).", 500
     else: return "Test başarılı! Yönetici CHAT_ID ayarlanmadı.", 200
-@app.route("/signal", methods=["POST"])
-def handle_signal(): # (Değişiklik Yok)
-    start_time = time.time(); signal_data_for_log = {}
+
+def process_signal(raw_data):
+    signal_data_for_log = {}
     try:
-        raw_data = request.data
         if not raw_data: print("⚠️ Sinyal: Boş veri."); return "error: empty body", 400
         try:
             signal_json_str = raw_data.decode('utf-8'); print(f"📄 Sinyal (raw): {signal_json_str}")
@@ -373,32 +1901,142 @@ def handle_signal(): # (Değişiklik Yok)
         if not all([symbol, exchange, signal_text]): print(f"❌ Sinyal: Eksik anahtar: {data}"); return "error: missing keys", 400
         print(f"✅ Sinyal alındı: {symbol} ({exchange}) - {signal_text}")
         append_to_jsonl(SIGNAL_LOG_FILE, signal_data_for_log)
-        simplified_exchange = simplify_exchange(exchange); signal_text_clean = str(signal_text).strip()
-        tg_message = (f"📡 Yeni Sinyal Geldi:\n\n*{symbol}* ({simplified_exchange})\n📍 _{signal_text_clean}_")
-        if ADMIN_CHAT_ID: send_telegram_message(ADMIN_CHAT_ID, tg_message, parse_mode="Markdown")
-        else: print("⚠️ ADMIN_CHAT_ID ayarlanmadı, sinyal gönderilemedi.")
+        signal_digest.add(symbol, exchange, signal_text) # Özet modu kapalıysa hemen gönderilir
         return "ok", 200
     except Exception as e:
         error_details = traceback.format_exc(); print(f"💥 Sinyal Endpoint HATA: {e}\n{error_details}")
-        if ADMIN_CHAT_ID:
-             try: request_data = request.get_data(as_text=True)
-             except Exception: request_data = "Request data could not be read."
-             error_message_to_admin = f"🚨 Sinyal Endpoint Hatası!\n\nError: {e}\n\nTraceback:\n{error_details}\n\nRequest Data:\n{request_data[:1000]}"
-             send_telegram_message(ADMIN_CHAT_ID, error_message_to_admin, parse_mode=None, avoid_self_notify=True)
+        _notify_endpoint_error("Sinyal Endpoint Hatası", e, error_details, raw_data)
         return "error: internal server error", 500
-    finally:
-        end_time = time.time(); print(f"⏱️ Sinyal işleme süresi: {end_time - start_time:.4f} saniye")
+
+def process_signal_batch(raw_data):
+    """ Birden çok sinyali tek istekte alır: [{"symbol", "exchange", "signal"}, ...] veya {"signals": [...]} """
+    try:
+        if not raw_data: print("⚠️ Toplu sinyal: Boş veri."); return "error: empty body", 400
+        try: payload = json.loads(raw_data.decode('utf-8'))
+        except Exception as e: print(f"❌ Toplu sinyal parse/decode hatası: {e}"); return "error: invalid data", 400
+        items = payload.get("signals") if isinstance(payload, dict) else payload
+        if not isinstance(items, list) or not items: print("❌ Toplu sinyal: Sinyal listesi yok."); return "error: expected a non-empty signal list", 400
+        if len(items) > SIGNAL_BATCH_MAX: print(f"❌ Toplu sinyal: {len(items)} sinyal (en fazla {SIGNAL_BATCH_MAX})."); return f"error: too many signals (max {SIGNAL_BATCH_MAX})", 413
+        accepted, rejected = [], []
+        for i, data in enumerate(items):
+            if not isinstance(data, dict) or not all([data.get("symbol"), data.get("exchange"), data.get("signal")]): rejected.append({"index": i, "error": "missing keys"}); continue
+            accepted.append(data.copy())
+        print(f"✅ Toplu sinyal alındı: {len(accepted)} kabul, {len(rejected)} red")
+        if accepted:
+            if not append_signals_to_log(accepted): return {"status": "error", "message": "Failed to write signal log."}, 500
+            signal_digest.add_many([(d["symbol"], d["exchange"], d["signal"]) for d in accepted])
+        return {"status": "ok", "accepted": len(accepted), "rejected": rejected}, 200
+    except Exception as e:
+        error_details = traceback.format_exc(); print(f"💥 Toplu Sinyal Endpoint HATA: {e}\n{error_details}")
+        _notify_endpoint_error("Toplu Sinyal Endpoint Hatası", e, error_details, raw_data)
+        return "error: internal server error", 500
+
+# (metot, yol) -> işleyici. Flask rotaları ve ASGI uygulaması bu tablodan kurulur.
+ROUTES = {("POST", "/clear_signals"): process_clear_signals, ("POST", "/telegram"): process_telegram_update,
+          ("GET", "/"): process_index, ("GET", "/test"): process_test,
+          ("POST", "/signal"): process_signal, ("POST", "/signals/batch"): process_signal_batch,
+          ("GET", "/metrics"): process_metrics, ("POST", "/debug/profiler"): process_profiler}
+
+def run_route(method, path, raw_data):
+    """ ROUTES işleyicisini çalıştırır ve süresini metriklere ekler. (gövde, durum, içerik türü veya None) döndürür. """
+    start = time.perf_counter(); result = ROUTES[(method, path)](raw_data)
+    metrics.observe("http_request_duration_seconds", time.perf_counter() - start, route=path)
+    metrics.inc("http_requests_total", route=path, status=str(result[1]))
+    return result[0], result[1], (result[2] if len(result) > 2 else None)
+
+def _collect_runtime_metrics():
+    """ Ölçüm anında okunan değerler: Telegram istemcisi, gönderim kuyruğu, sinyal kaydı ve önbellekler """
+    tg = telegram_client.stats(); files, size = signal_store.disk_usage()
+    queue_depth = (_delivery_scheduler.size if _delivery_scheduler is not None else 0) + (_async_delivery.scheduler.size if _async_delivery is not None else 0)
+    caches = ((os.path.basename(ANALIZ_FILE), analiz_cache), (os.path.basename(BIST_ANALIZ_FILE), bist_analiz_cache))
+    return [
+        ("telegram_api_requests_total", "counter", "Telegram API istekleri (HTTP durum kodu bazında)", [({"status": str(k)}, v) for k, v in sorted(tg["status_counts"].items())]),
+        ("telegram_api_errors_total", "counter", "Yanıt alınamayan Telegram API istekleri", [({}, tg["errors"])]),
+        ("telegram_api_request_duration_seconds", "histogram", "Telegram API istek süresi", [({}, tg["latency"])]),
+        ("telegram_api_connections", "gauge", "Havuzdaki açık Telegram API bağlantıları", [({}, tg["connections_opened"])]),
+        ("telegram_queue_depth", "gauge", "Gönderim kuyruğunda bekleyen mesajlar", [({}, queue_depth)]),
+        ("signal_log_bytes", "gauge", "Sinyal kaydının diskteki boyutu (gün dosyaları ve arşivler)", [({}, size)]),
+        ("signal_log_files", "gauge", "Sinyal kaydı dosya sayısı", [({}, files)]),
+        ("signals_today", "gauge", "Bugün kaydedilen sinyaller", [({}, signal_store.count(date.today().isoformat()))]),
+        ("json_cache_records", "gauge", "Bellekteki analiz verisi kayıt sayısı", [({"file": name}, len(cache.data or {})) for name, cache in caches]),
+        ("json_cache_version", "gauge", "Analiz dosyasının yüklenen sürüm sayısı", [({"file": name}, cache.version) for name, cache in caches]),
+        ("render_cache_entries", "gauge", "Hazır mesaj önbelleğindeki kayıtlar", [({"cache": "analiz"}, len(analiz_render_cache.items)), ({"cache": "bist_analiz"}, len(bist_render_cache.items))]),
+        ("profiler_running", "gauge", "Örnekleyici profiler çalışıyor mu", [({}, int(profiler.running))]),
+    ]
+
+metrics.collectors.append(_collect_runtime_metrics)
+
+# --- Flask Rotaları ---
+def _flask_view(method, path):
+    def view():
+        body, status, content_type = run_route(method, path, request.get_data())
+        if isinstance(body, dict): return jsonify(body), status
+        return (Response(body, status, content_type=content_type) if content_type else (body, status))
+    view.__name__ = ROUTES[(method, path)].__name__
+    return view
+
+for _method, _path in ROUTES: app.add_url_rule(_path, view_func=_flask_view(_method, _path), methods=[_method])
+
+# --- ASGI Uygulaması (--asgi) ---
+# İşleyiciler dosya G/Ç'si yaptığı için thread havuzunda çalışır; olay döngüsü yalnızca bağlantıları ve TG gönderimini yürütür.
+async def _asgi_lifespan(receive, send):
+    global _async_delivery
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            if TELEGRAM_ASYNC_DELIVERY:
+                delivery = AsyncTelegramDelivery()
+                try: await delivery.start(); _async_delivery = delivery
+                except ImportError: print("⚠️ httpx kurulu değil; TG gönderimi thread kuyruğuyla yapılacak.")
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await asyncio.to_thread(signal_digest.flush) # Bekleyen özet kapanmadan kuyruğa girsin
+            if _async_delivery is not None:
+                delivery = _async_delivery; await delivery.close(); _async_delivery = None
+            await send({"type": "lifespan.shutdown.complete"}); return
+
+async def _asgi_respond(send, body, status, content_type=None):
+    if isinstance(body, dict): payload = json.dumps(body).encode('utf-8'); content_type = b"application/json"
+    else: payload = str(body).encode('utf-8'); content_type = (content_type or "text/html; charset=utf-8").encode()
+    await send({"type": "http.response.start", "status": status, "headers": [(b"content-type", content_type), (b"content-length", str(len(payload)).encode())]})
+    await send({"type": "http.response.body", "body": payload})
+
+async def asgi_app(scope, receive, send):
+    """ Flask rotalarının ASGI karşılığı (uvicorn ile çalıştırılır) """
+    if scope["type"] == "lifespan": return await _asgi_lifespan(receive, send)
+    if scope["type"] != "http": return
+    method = "GET" if scope["method"] == "HEAD" else scope["method"]
+    if (method, scope["path"]) not in ROUTES:
+        allowed = [m for m, p in ROUTES if p == scope["path"]]
+        return await _asgi_respond(send, "Method Not Allowed" if allowed else "Not Found", 405 if allowed else 404)
+    chunks = []; more_body = True
+    while more_body:
+        message = await receive()
+        if message["type"] == "http.disconnect": return
+        chunks.append(message.get("body", b"")); more_body = message.get("more_body", False)
+    body, status, content_type = await asyncio.to_thread(run_route, method, scope["path"], b"".join(chunks))
+    await _asgi_respond(send, body, status, content_type)
 
 # --- Sunucuyu Başlatma ---
 if __name__ == "__main__":
+    import signal
+    server_mode = "asgi" if "--asgi" in sys.argv[1:] else SERVER_MODE
     print("==============================================")
-    print("✅ SignalCihangir Flask Bot Başlatılıyor...")
+    print(f"✅ SignalCihangir {'ASGI (uvicorn)' if server_mode == 'asgi' else 'Flask (waitress)'} Bot Başlatılıyor...")
     print(f"🔧 Ortam: {'Production' if not os.getenv('FLASK_DEBUG') else 'Development'}")
-    print(f"🔗 Dinlenen Adres: http://0.0.0.0:5000")
+    print(f"🔗 Dinlenen Adres: http://0.0.0.0:{PORT}")
     print(f"📄 ABD Analiz Dosyası: {ANALIZ_FILE}")
     print(f"📄 BIST Puanlama Dosyası: {BIST_ANALIZ_FILE}")
-    print(f"📄 Sinyal Log Dosyası: {SIGNAL_LOG_FILE}")
+    print(f"📄 Sinyal Log Dosyası: {SIGNAL_LOG_FILE} (depolama: {type(signal_store).__name__})")
     print(f"👤 Yönetici Chat ID: {ADMIN_CHAT_ID if ADMIN_CHAT_ID else 'Ayarlanmadı'}")
     print("==============================================")
-    from waitress import serve
-    serve(app, host="0.0.0.0", port=5000)
+    if server_mode == "asgi":
+        import uvicorn # SIGTERM'i kendisi yakalar: lifespan kapanışı bekleyen TG mesajlarını gönderir
+        if SERVER_WORKERS > 1: # Her süreç main'i yeniden yükler; sinyal kaydı STATE_BACKEND üzerinden paylaşılır
+            uvicorn.run(f"{os.path.splitext(os.path.basename(__file__))[0]}:asgi_app", app_dir=os.path.dirname(os.path.abspath(__file__)),
+                        host="0.0.0.0", port=PORT, workers=SERVER_WORKERS, access_log=False, log_level="warning")
+        else: uvicorn.run(asgi_app, host="0.0.0.0", port=PORT, access_log=False, log_level="warning")
+    else:
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0)) # atexit (TG kuyruğu boşaltma) çalışsın
+        from waitress import serve
+        serve(app, host="0.0.0.0", port=PORT, threads=WAITRESS_THREADS)
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+""" main içe aktarılmadan önce ortamı hazırlar: geçici dizindeki dosyalar, senkron gönderim, hız sınırı yok ve
+Telegram API'si olarak loadtest.py'deki sahte sunucu (TELEGRAM_API_BASE yapılandırmayı okurken bir kez alınır). """
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from loadtest import FakeTelegramAPI
+
+TEST_DIR = tempfile.mkdtemp(prefix="signalcihangir-test-"); atexit.register(shutil.rmtree, TEST_DIR, True)
+telegram_api = FakeTelegramAPI().start(); atexit.register(telegram_api.stop)
+os.environ.update(BOT_TOKEN="123456:TEST", CHAT_ID="1000", TELEGRAM_API_BASE=telegram_api.base_url, TELEGRAM_ASYNC_DELIVERY="0",
+                  TELEGRAM_GLOBAL_RATE="0", TELEGRAM_CHAT_INTERVAL="0", TELEGRAM_GROUP_INTERVAL="0", SIGNAL_ARCHIVE_INTERVAL="0",
+                  SIGNAL_LOG_COMMIT_WINDOW_MS="0", STATE_BACKEND="local", SIGNAL_LOG_FILE_PATH=os.path.join(TEST_DIR, "signals.json"),
+                  ANALIZ_FILE_PATH=os.path.join(TEST_DIR, "analiz.json"), ANALIZ_SONUCLARI_FILE_PATH=os.path.join(TEST_DIR, "analiz_sonuclari.json"))
+
+@pytest.fixture
+def fake_telegram():
+    """ Ortak sahte Telegram API'si; her testte gecikme ve sıradaki yanıtlar sıfırlanır """
+    telegram_api.scripted.clear(); telegram_api.latency = 0.0
+    yield telegram_api
+    telegram_api.scripted.clear(); telegram_api.latency = 0.0
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+""" iter_message_chunks özellik testleri: bayt sınırı, içeriğin sırasıyla korunması ve kapalı Markdown varlıklarının bölünmemesi """
+from hypothesis import given, settings, strategies as st
+
+import main
+
+WORD_CHARS = "abcçdefgğhıijklmnoöprsştuüvyzABCÇĞİÖŞÜ0123456789.,:;!?-+=%()🚀📊"
+words = st.text(alphabet=WORD_CHARS, min_size=1, max_size=12)
+inner = st.lists(words, min_size=1, max_size=4).map(" ".join) # Varlık içi: boşluklu birkaç kelime
+entities = st.one_of(inner.map(lambda t: f"*{t}*"), inner.map(lambda t: f"_{t}_"), inner.map(lambda t: f"`{t}`"),
+                     st.lists(words, min_size=1, max_size=4).map(lambda ws: "```" + "\n".join(ws) + "```"),
+                     st.tuples(inner, words).map(lambda p: f"[{p[0]}](https://t.me/{p[1].replace('(', '').replace(')', '') or 'x'})"))
+separators = st.sampled_from([" ", " ", "\n", "\n\n"])
+tokens = st.lists(st.tuples(st.one_of(words, entities), separators), min_size=1, max_size=300)
+max_bytes = st.integers(min_value=96, max_value=600) # Her varlık tek başına sığar
+
+def _non_whitespace(text): return "".join(text.split())
+
+@settings(max_examples=400, deadline=None)
+@given(st.text(max_size=3000), st.integers(min_value=4, max_value=600), st.booleans()) # En az bir UTF-8 karakteri sığar
+def test_chunks_fit_byte_limit_and_keep_content(msg, limit, markdown):
+    chunks = list(main.iter_message_chunks(msg, max_bytes=limit, markdown=markdown))
+    assert all(len(c.encode("utf-8")) <= limit for c in chunks)
+    assert _non_whitespace("".join(chunks)) == _non_whitespace(msg)
+
+@settings(max_examples=400, deadline=None)
+@given(tokens, max_bytes)
+def test_closed_entities_are_never_split(parts, limit):
+    msg = "".join(token + sep for token, sep in parts)
+    chunks = list(main.iter_message_chunks(msg, max_bytes=limit))
+    assert all(len(c.encode("utf-8")) <= limit for c in chunks)
+    assert _non_whitespace("".join(chunks)) == _non_whitespace(msg)
+    for token, _ in parts:
+        if token[0] in "*_`[": assert any(token in c for c in chunks), f"varlık bölündü: {token!r}"
+
+def test_short_message_is_single_chunk():
+    assert list(main.iter_message_chunks("*kısa* mesaj")) == ["*kısa* mesaj"]
+
+def test_unclosed_entity_still_respects_limit():
+    msg = "*" + "açık varlık " * 1000
+    assert all(len(c.encode("utf-8")) <= 4096 for c in main.iter_message_chunks(msg))
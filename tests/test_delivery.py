@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+""" Gönderim kuyruğunun sohbet bazında zamanlanması: hız sınırına takılan yoğun sohbet diğer sohbetleri bekletmez/düşürmez """
+import asyncio
+import threading
+import time
+
+import pytest
+
+import main
+
+ALERTS = 300 # Eski tasarımda sohbet başına kuyruk (1000 // 4 = 250) dolup mesaj düşürüyordu
+
+@pytest.fixture
+def sent_chats(fake_telegram, monkeypatch):
+    """ Gönderimi başlayan parçaların (sohbet, zaman) listesi; sohbet aralığı 10 ms (uyarı seli ~3 sn sürer) """
+    sent = []; lock = threading.Lock(); original = main._post_telegram_chunk
+    def post(chat_id, text, parse_mode):
+        with lock: sent.append((str(chat_id), time.monotonic()))
+        return original(chat_id, text, parse_mode)
+    original_async = main.AsyncTelegramDelivery._post_chunk
+    async def post_async(self, chat_id, text, parse_mode):
+        with lock: sent.append((str(chat_id), time.monotonic()))
+        return await original_async(self, chat_id, text, parse_mode)
+    monkeypatch.setattr(main, "_post_telegram_chunk", post); monkeypatch.setattr(main.AsyncTelegramDelivery, "_post_chunk", post_async)
+    monkeypatch.setattr(main, "_chat_pacer", main._ChatPacer(0.01, 0.03))
+    monkeypatch.setattr(main, "TELEGRAM_QUEUE_SIZE", 1000); monkeypatch.setattr(main, "TELEGRAM_CHAT_QUEUE_SIZE", 500)
+    return sent
+
+@pytest.fixture
+def thread_delivery(sent_chats, monkeypatch):
+    monkeypatch.setattr(main, "TELEGRAM_ASYNC_DELIVERY", True)
+    monkeypatch.setattr(main, "_delivery_scheduler", None); monkeypatch.setattr(main, "_delivery_threads", []); monkeypatch.setattr(main, "_delivery_stopping", False)
+    yield sent_chats
+    main.flush_telegram_queue(timeout=10)
+    assert main._delivery_scheduler.size == 0 and not any(t.is_alive() for t in main._delivery_threads)
+
+def _reply_overtakes_alerts(send, sent):
+    """ Yönetici sohbetine uyarı seli ve ardından bir kullanıcı yanıtı: yanıt selin sonunu beklemeden gider """
+    dropped = main.metrics.counter_value("telegram_dropped_total")
+    assert all(send(main.ADMIN_CHAT_ID, f"📡 uyarı {i}") for i in range(ALERTS))
+    start = time.monotonic(); assert send(42, "yanıt")
+    while not any(chat == "42" for chat, _ in sent) and time.monotonic() - start < 5: time.sleep(0.005)
+    replied = [at for chat, at in sent if chat == "42"]
+    assert replied and replied[0] - start < 0.5
+    assert sum(chat == main.ADMIN_CHAT_ID for chat, _ in sent) < ALERTS # Uyarılar hâlâ sırada
+    assert main.metrics.counter_value("telegram_dropped_total") == dropped
+
+def test_paced_chat_does_not_hold_workers(thread_delivery):
+    _reply_overtakes_alerts(main.send_telegram_message, thread_delivery)
+    main.flush_telegram_queue(timeout=10)
+    admin = [at for chat, at in thread_delivery if chat == main.ADMIN_CHAT_ID]
+    assert len(admin) == ALERTS and admin[-1] - admin[0] >= 0.95 * (ALERTS - 1) * 0.01 # Sohbet aralığı korunur
+
+def test_chat_order_and_per_chat_cap(sent_chats):
+    scheduler = main._ChatScheduler(capacity=10, per_chat=3, pacer=main._chat_pacer)
+    assert [scheduler.put(1, i) for i in range(4)] == [True, True, True, False] # Sohbet sınırı
+    assert all(scheduler.put(chat, "x") for chat in range(2, 9)) and not scheduler.put(9, "x") # Toplam sınır
+    order = []
+    while scheduler.size:
+        with scheduler.lock: chat_id, job = scheduler.take()
+        if chat_id is None: time.sleep(job); continue
+        if chat_id == "1": order.append(job)
+        scheduler.release(chat_id, job, finished=True)
+    assert order == [0, 1, 2]
+
+def test_async_delivery_schedules_per_chat(sent_chats):
+    pytest.importorskip("httpx")
+    async def scenario():
+        delivery = main.AsyncTelegramDelivery(); await delivery.start()
+        try: await asyncio.to_thread(_reply_overtakes_alerts, delivery.submit, sent_chats) # submit başka thread'den
+        finally: await delivery.close(timeout=10)
+        return delivery
+    assert asyncio.run(scenario()).scheduler.size == 0
+    assert sum(chat == main.ADMIN_CHAT_ID for chat, _ in sent_chats) == ALERTS
+
+def test_async_submit_reports_dropped_message(sent_chats):
+    pytest.importorskip("httpx")
+    async def scenario():
+        delivery = main.AsyncTelegramDelivery(scheduler=main._ChatScheduler(capacity=4, per_chat=1, pacer=main._chat_pacer)); await delivery.start()
+        try: return [delivery.submit(42, "bir"), delivery.submit(42, "iki"), delivery.submit(43, "üç")]
+        finally: await delivery.close(timeout=5)
+    dropped = main.metrics.counter_value("telegram_dropped_total")
+    assert asyncio.run(scenario()) == [True, False, True]
+    assert main.metrics.counter_value("telegram_dropped_total") == dropped + 1
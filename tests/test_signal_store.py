@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+""" Sinyal kaydı arka uçlarının (local, sqlite) aynı davranması: eski tek dosyanın taşınması, has_day, /ozet yanıtları,
+geçmiş günlerin arşivlenmesi ve /clear_signals """
+import json
+import os
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import main
+
+def _open_store(backend, directory):
+    base = os.path.join(directory, "signals.json")
+    return main.SqliteSignalStore(os.path.join(directory, "signals.db"), base) if backend == "sqlite" else main.SignalStore(base)
+
+def _write_legacy_log(directory, signals):
+    with open(os.path.join(directory, "signals.json"), "w", encoding="utf-8") as f:
+        for data in signals: f.write(json.dumps(dict(data, server_timestamp=datetime.now().isoformat()), ensure_ascii=False) + "\n")
+
+@pytest.fixture
+def ozet_replies(monkeypatch):
+    replies = []; monkeypatch.setattr(main, "send_telegram_message", lambda chat_id, msg, **kwargs: replies.append(msg))
+    return replies
+
+@pytest.mark.parametrize("backend", ["local", "sqlite"])
+def test_legacy_log_is_migrated_and_answers_ozet(backend, tmp_path, monkeypatch, ozet_replies):
+    _write_legacy_log(tmp_path, [{"symbol": "THYAO", "exchange": "BIST_DLY", "signal": "Mükemmel Alış"}, {"symbol": "BTC", "exchange": "BINANCE", "signal": "RSI 80"}])
+    store = _open_store(backend, tmp_path); monkeypatch.setattr(main, "signal_store", store); today = date.today().isoformat()
+    try:
+        assert store.has_day(today)
+        assert not os.path.exists(tmp_path / "signals.json") and os.path.exists(tmp_path / "signals.json.migrated")
+        assert store.summary(today) == (2, {"mukemmel_alis": ["THYAO (BIST): Mükemmel Alış"]})
+        assert store.count(today, "BIST") == 1 and [d["symbol"] for d in store.signals_for_day(today, "BINANCE")] == ["BTC"]
+        main.handle_ozet_command(1, "BIST"); assert "THYAO" in ozet_replies[-1]
+        store.clear(include_archives=True)
+        assert not store.has_day(today)
+        main.handle_ozet_command(1, ""); assert ozet_replies[-1] == "ℹ️ Bugün için kaydedilmiş sinyal bulunamadı."
+    finally: store.close()
+
+class _Yesterday(datetime):
+    """ append_many'nin zaman damgasını düne çeker (yazıcı dünün dosyasını açık tutar; gece yarısı sonrası durumu) """
+    @classmethod
+    def now(cls, tz=None): return datetime.now(tz) - timedelta(days=1)
+
+@pytest.mark.parametrize("backend", ["local", "sqlite"])
+def test_past_day_written_by_writer_is_compacted_and_survives_clear(backend, tmp_path, monkeypatch):
+    store = _open_store(backend, tmp_path); monkeypatch.setattr(main, "signal_store", store)
+    yesterday = (date.today() - timedelta(days=1)).isoformat(); today = date.today().isoformat()
+    try:
+        with monkeypatch.context() as m:
+            m.setattr(main, "datetime", _Yesterday)
+            store.append_many([{"symbol": "THYAO", "exchange": "BIST", "signal": "Mükemmel Alış"} for _ in range(3)]) # Tekrarlar
+            store.append_many([{"symbol": "BTC", "exchange": "BINANCE", "signal": "Mükemmel Satış"}])
+        store.append_many([{"symbol": "ASELS", "exchange": "BIST", "signal": "Alış Sayımı Tamamlandı"}])
+        assert store.count(yesterday) == 4
+        assert store.compact_day(yesterday) == (2, 2) # Yazıcının açık tuttuğu dünün dosyası kapatılır
+        assert store.summary(yesterday) == (2, {"mukemmel_alis": ["THYAO (BIST): Mükemmel Alış"], "mukemmel_satis": ["BTC (BINANCE): Mükemmel Satış"]})
+        assert store.archive_old_days() == [] # Arşivlenmiş gün yeniden işlenmez
+        if backend == "local": assert os.path.exists(store.archive_path(yesterday)) and not os.path.exists(store.partition_path(yesterday))
+    finally: store.close()
+
+@pytest.mark.parametrize("backend", ["local", "sqlite"])
+def test_clear_signals_archives_open_past_day_first(backend, tmp_path, monkeypatch):
+    store = _open_store(backend, tmp_path); monkeypatch.setattr(main, "signal_store", store)
+    yesterday = (date.today() - timedelta(days=1)).isoformat(); today = date.today().isoformat()
+    try:
+        with monkeypatch.context() as m:
+            m.setattr(main, "datetime", _Yesterday); store.append_many([{"symbol": "THYAO", "exchange": "BIST", "signal": "Mükemmel Alış"}])
+        store.append_many([{"symbol": "ASELS", "exchange": "BIST", "signal": "Mükemmel Alış"}])
+        monkeypatch.setattr(main, "SIGNAL_ARCHIVE_INTERVAL", 3600.0) # clear önce geçmiş günleri arşivler
+        body, status = main.process_clear_signals(b"")[:2]
+        assert status == 200, body
+        assert store.has_day(yesterday) and store.count(yesterday) == 1 # Arşiv korunur
+        assert not store.has_day(today)
+        assert main.process_clear_signals(json.dumps({"archives": True}).encode())[1] == 200
+        assert not store.has_day(yesterday)
+    finally: store.close()
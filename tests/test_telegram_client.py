@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+""" TelegramClient'ın yerel sahte Telegram API'sine karşı testleri: keep-alive havuzu, ayrı zaman aşımları, 429/5xx tekrarları ve metrikler """
+import threading
+
+import pytest
+import requests
+
+import main
+
+def _client(**kwargs): return main.TelegramClient(main.BOT_TOKEN, **kwargs) # api_base: TELEGRAM_API_BASE (sahte sunucu)
+
+def test_requests_reuse_pooled_connections(fake_telegram):
+    client = _client(pool_size=4); clients_before = set(fake_telegram.clients)
+    for i in range(20): assert client.post("sendMessage", {"chat_id": 1, "text": f"sıralı {i}"}).status_code == 200
+    def worker(k):
+        for i in range(25): client.post("sendMessage", {"chat_id": 2, "text": f"paralel {k}-{i}"})
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(4)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    stats = client.stats()
+    assert stats["requests"] == 120 and stats["errors"] == 0
+    assert stats["connections_opened"] <= 4 and stats["pool_hits"] > 0
+    assert len(fake_telegram.clients - clients_before) <= 4 # Sunucu tarafında da yeni bağlantı açılmadı
+
+def test_connect_and_read_timeouts_are_separate(fake_telegram, monkeypatch):
+    client = _client(connect_timeout=1.5, read_timeout=0.2); seen = []
+    original_post = client.session.post
+    monkeypatch.setattr(client.session, "post", lambda *args, **kwargs: (seen.append(kwargs["timeout"]), original_post(*args, **kwargs))[1])
+    assert client.post("sendMessage", {"chat_id": 1, "text": "hızlı"}).status_code == 200
+    assert seen == [(1.5, 0.2)]
+    fake_telegram.latency = 0.6 # Okuma zaman aşımını (0.2 sn) aşar, bağlanmayı değil
+    with pytest.raises(requests.exceptions.ReadTimeout): client.post("sendMessage", {"chat_id": 1, "text": "yavaş"})
+    assert client.stats()["errors"] == 1
+
+def test_rate_limited_request_is_retried_and_recorded(fake_telegram, monkeypatch):
+    client = _client(); monkeypatch.setattr(main, "telegram_client", client)
+    retries = main.metrics.counter_value("telegram_retries_total", reason="rate_limited"); requests_before = fake_telegram.requests
+    fake_telegram.scripted.append((429, {"ok": False, "error_code": 429, "description": "Too Many Requests", "parameters": {"retry_after": 0}}))
+    r = main._post_telegram_chunk(42, "merhaba", None)
+    assert r.status_code == 200 and fake_telegram.requests - requests_before == 2
+    stats = client.stats()
+    assert stats["status_counts"] == {429: 1, 200: 1}
+    assert stats["latency"]["count"] == 2 and stats["latency"]["sum"] > 0
+    assert main.metrics.counter_value("telegram_retries_total", reason="rate_limited") == retries + 1
+
+def test_server_error_is_retried_with_backoff(fake_telegram, monkeypatch):
+    client = _client(); monkeypatch.setattr(main, "telegram_client", client); monkeypatch.setattr(main, "_retry_delay", lambda attempt: 0.0)
+    fake_telegram.scripted.extend([(502, {"ok": False}), (500, {"ok": False})])
+    assert main._post_telegram_chunk(42, "merhaba", None).status_code == 200
+    assert client.stats()["status_counts"] == {502: 1, 500: 1, 200: 1}
+
+def test_deliver_message_through_stub(fake_telegram):
+    messages = fake_telegram.messages
+    assert main.deliver_telegram_message(42, "*kalın* ve _italik_ " * 800) # 4096 baytı aşar: birden çok parça
+    assert fake_telegram.messages - messages >= 2